@@ -0,0 +1,147 @@
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    JsonResponse,
+)
+from django.shortcuts import redirect
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (
+    LEGACY_SHORT_LINK_LENGTH,
+    Favorite,
+    Recipe,
+    ShoppingCart,
+    ShortLink,
+)
+from .serializers import CustomUserSerializer, ShoppingCartRecipeSerializer
+from .utils import decode_short_link
+from .views import toggle_recipe
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    # Same body as DRF's JSONRenderer, which does not escape non-ASCII.
+    return JsonResponse(
+        data, status=status_code, safe=False,
+        json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def async_api_view(*methods):
+    # Django 4.2 view decorators return sync wrappers, which would turn
+    # these views back into sync ones.
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            try:
+                request.user = await authenticate(request)
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                detail = exc.detail
+                if not isinstance(detail, (dict, list)):
+                    detail = {'detail': detail}
+                response = json_response(detail, exc.status_code)
+                if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                    response['WWW-Authenticate'] = 'Token'
+                return response
+
+        # Only token authentication is accepted, as in the DRF views.
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+async def authenticate(request):
+    header = request.headers.get('Authorization', '').split()
+    if not header or header[0].lower() != 'token':
+        raise exceptions.NotAuthenticated()
+    token = None
+    if len(header) == 2:
+        token = await Token.objects.select_related('user').filter(
+            key=header[1]
+        ).afirst()
+    if token is None or not token.user.is_active:
+        raise exceptions.AuthenticationFailed()
+    return token.user
+
+
+async def get_recipe(pk):
+    recipe = await Recipe.objects.filter(id=pk).afirst()
+    if recipe is None:
+        raise exceptions.NotFound()
+    return recipe
+
+
+async def toggle(request, model, pk):
+    recipe = await get_recipe(pk)
+    add = request.method == 'POST'
+    if not await sync_to_async(toggle_recipe)(
+        model, request.user, recipe.id, add
+    ):
+        return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
+    if not add:
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+    return json_response(
+        ShoppingCartRecipeSerializer(recipe).data, status.HTTP_201_CREATED
+    )
+
+
+@async_api_view('POST', 'DELETE')
+async def favorite(request, pk):
+    return await toggle(request, Favorite, pk)
+
+
+@async_api_view('POST', 'DELETE')
+async def shopping_cart(request, pk):
+    return await toggle(request, ShoppingCart, pk)
+
+
+def save_avatar(user, data):
+    serializer = CustomUserSerializer(user, data=data, partial=True)
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+
+
+def delete_avatar(user):
+    CustomUserSerializer(user).delete_avatar()
+
+
+@async_api_view('PUT', 'DELETE')
+async def avatar(request):
+    user = request.user
+    if request.method == 'DELETE':
+        await sync_to_async(delete_avatar)(user)
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        raise exceptions.ParseError()
+    # Decoding and resizing the image and writing the files are blocking.
+    await sync_to_async(save_avatar)(user, data)
+    return json_response(
+        {'avatar': request.build_absolute_uri(user.avatar.url)}
+    )
+
+
+async def short_link(request, code):
+    if len(code) == LEGACY_SHORT_LINK_LENGTH:
+        recipe_id = await ShortLink.objects.filter(code=code).values_list(
+            'recipe_id', flat=True
+        ).afirst()
+    else:
+        recipe_id = decode_short_link(code)
+        if (recipe_id is not None
+                and not await Recipe.objects.filter(id=recipe_id).aexists()):
+            recipe_id = None
+    if recipe_id is None:
+        raise Http404(f'Не существует рецепта по ссылке {code}')
+
+    return redirect(f'/recipes/{recipe_id}/')
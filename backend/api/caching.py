@@ -0,0 +1,67 @@
+import hashlib
+
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipes.versions import get_timeout, get_version
+
+
+class VersionedCacheMixin:
+
+    cache_namespace = None
+    cache_timeout = 60 * 60 * 24
+    cache_max_age = 60
+    cache_anonymous_only = False
+    # Only these parameters change the response; others must not spawn
+    # cache entries of their own.
+    cache_query_params = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cache_etag(self, request):
+        query = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+            if name in self.cache_query_params
+        )
+        key = (
+            f'{get_version(self.cache_namespace)}:'
+            f'{request.accepted_media_type}:{request.get_host()}:'
+            f'{request.path}:{query}'
+        )
+        return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if self.cache_anonymous_only and request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        etag = self.get_cache_etag(request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = f'response:{self.cache_namespace}:{etag}'
+            data = cache.get(key)
+            if data is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(
+                    key, response.data, get_timeout(self.cache_timeout)
+                )
+            else:
+                response = Response(data)
+
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=self.cache_max_age)
+        if self.cache_anonymous_only:
+            # Authenticated clients get per-user payloads from the same URL.
+            patch_vary_headers(response, ('Authorization',))
+        return response
@@ -1,14 +1,85 @@
 import base64
+import binascii
+from io import BytesIO
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile,
+    TemporaryUploadedFile,
+)
 from rest_framework import serializers
 
+from recipes.images import MAX_IMAGE_SIDE, MIN_IMAGE_SIDE
+
+
+DATA_URI_PREFIX = 'data:'
+BASE64_MARKER = ';base64,'
+MAX_HEADER_LENGTH = 64
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+def decode_data_uri(data):
+    header_end = data.find(BASE64_MARKER, 0, MAX_HEADER_LENGTH)
+    if header_end == -1:
+        raise serializers.ValidationError(
+            'Изображение должно быть передано как data URI в base64.'
+        )
+    content_type = data[len(DATA_URI_PREFIX):header_end].lower()
+    if content_type not in settings.IMAGE_UPLOAD_CONTENT_TYPES:
+        raise serializers.ValidationError(
+            f'Формат {content_type} не поддерживается.'
+        )
+
+    start = header_end + len(BASE64_MARKER)
+    size = (len(data) - start) // 4 * 3
+    if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise serializers.ValidationError(
+            'Изображение больше '
+            f'{settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)} МБ.'
+        )
+
+    name = 'image.' + content_type.split('/')[-1]
+    if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+        file = TemporaryUploadedFile(name, content_type, size, None)
+    else:
+        file = InMemoryUploadedFile(
+            BytesIO(), None, name, content_type, size, None
+        )
+    try:
+        for position in range(start, len(data), DECODE_CHUNK_SIZE):
+            file.write(base64.b64decode(
+                data[position:position + DECODE_CHUNK_SIZE], validate=True
+            ))
+    except binascii.Error:
+        file.close()
+        raise serializers.ValidationError('Некорректные данные base64.')
+    file.size = file.tell()
+    file.seek(0)
+    return file
+
 
 class Base64ImageField(serializers.ImageField):
 
     def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-        return super().to_internal_value(data)
+        if isinstance(data, str) and data.startswith(DATA_URI_PREFIX):
+            data = decode_data_uri(data)
+        image = super().to_internal_value(data)
+        if not (MIN_IMAGE_SIDE <= min(image.image.size)
+                and max(image.image.size) <= MAX_IMAGE_SIDE):
+            raise serializers.ValidationError(
+                f'Стороны изображения должны быть от {MIN_IMAGE_SIDE} '
+                f'до {MAX_IMAGE_SIDE} пикселей.'
+            )
+        return image
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        return {
+            variant: request.build_absolute_uri(url) if request else url
+            for variant, url in value.variants.items()
+        }
@@ -0,0 +1,64 @@
+import heapq
+from bisect import bisect_left
+
+from recipes.models import Ingredient
+from recipes.versions import INGREDIENTS, get_version
+
+
+AUTOCOMPLETE_LIMIT = 50
+
+
+def normalize(text):
+    return text.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+
+    def __init__(self, version, ingredients):
+        self.version = version
+        entries = []
+        for id, name, measurement_unit in ingredients:
+            ingredient = {
+                'id': id,
+                'name': name,
+                'measurement_unit': measurement_unit,
+            }
+            key = normalize(name)
+            entries.append((key, 0, ingredient))
+            for position, char in enumerate(key):
+                if char == ' ':
+                    entries.append((key[position + 1:], 1, ingredient))
+        entries.sort(key=lambda entry: entry[0])
+        self.keys = [entry[0] for entry in entries]
+        self.entries = entries
+
+    def search(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        prefix = normalize(prefix)
+        position = bisect_left(self.keys, prefix)
+        matches = {}
+        while (position < len(self.keys)
+               and self.keys[position].startswith(prefix)):
+            _, is_inner, ingredient = self.entries[position]
+            rank = (is_inner, len(ingredient['name']), ingredient['name'])
+            best = matches.get(ingredient['id'])
+            if best is None or rank < best[0]:
+                matches[ingredient['id']] = (rank, ingredient)
+            position += 1
+        ranked = heapq.nsmallest(
+            limit, matches.values(), key=lambda match: match[0]
+        )
+        return [ingredient for _, ingredient in ranked]
+
+
+_index = None
+
+
+def get_ingredient_index():
+    global _index
+    version = get_version(INGREDIENTS)
+    if _index is None or _index.version != version:
+        _index = IngredientIndex(
+            version,
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        )
+    return _index
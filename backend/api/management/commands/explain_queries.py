@@ -0,0 +1,217 @@
+import json
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.http import HttpRequest, QueryDict
+from rest_framework.request import Request
+
+from api.pagination import CustomPagination
+from api.views import RecipeViewSet
+from recipes.models import (
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListItem,
+    ShortLink,
+    Tag
+)
+from users.models import Subscription, User
+
+
+PAGE_SIZE = CustomPagination.page_size
+
+
+def seq_scans(plan):
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan['Relation Name']
+    for child in plan.get('Plans', ()):
+        yield from seq_scans(child)
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Выполняет EXPLAIN для основных запросов API и завершается с '
+        'ошибкой, если какой-то из них читает большую таблицу целиком.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=10000,
+            help='С какого числа строк таблица считается большой.',
+        )
+        parser.add_argument(
+            '--no-analyze',
+            action='store_true',
+            help='Не обновлять статистику планировщика перед проверкой.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                'Проверка планов поддерживается только для PostgreSQL.'
+            )
+        if not options['no_analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        self.table_sizes = {}
+        failed = []
+        for name, queryset in self.get_queries():
+            plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+            tables = sorted({
+                table for table in seq_scans(plan)
+                if self.get_table_size(table) >= options['min_rows']
+            })
+            if options['verbosity'] >= 2:
+                self.stdout.write(json.dumps(plan, indent=2))
+            if tables:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: последовательное сканирование '
+                    f'{", ".join(tables)}'
+                ))
+            else:
+                self.stdout.write(f'{name}: OK')
+
+        if failed:
+            raise CommandError(
+                f'Запросы без подходящих индексов: {", ".join(failed)}.'
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Все запросы используют индексы.')
+        )
+
+    def get_table_size(self, table):
+        if table not in self.table_sizes:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+                )
+                self.table_sizes[table] = cursor.fetchone()[0]
+        return self.table_sizes[table]
+
+    def get_recipes(self, user=None, **params):
+        http_request = HttpRequest()
+        http_request.method = 'GET'
+        http_request.GET = QueryDict(urlencode(params, doseq=True))
+        request = Request(http_request)
+        request.user = user or AnonymousUser()
+        view = RecipeViewSet(
+            request=request, action='list', format_kwarg=None, kwargs={}
+        )
+        return view.filter_queryset(view.get_queryset())
+
+    def get_queries(self):
+        user_id = ShoppingCart.objects.values_list('author', flat=True).first()
+        author_id = Subscription.objects.values_list(
+            'author', flat=True
+        ).first()
+        recipe = Recipe.objects.order_by('-id').first()
+        tag = Tag.objects.first()
+        ingredient = Ingredient.objects.first()
+        if None in (user_id, author_id, recipe, tag, ingredient):
+            raise CommandError(
+                'В базе не хватает данных, заполните её командой '
+                'generate_dataset.'
+            )
+        user = User.objects.get(pk=user_id)
+        author = User.objects.get(pk=author_id)
+
+        return (
+            ('recipes', self.get_recipes()[:PAGE_SIZE]),
+            (
+                'recipes_cursor',
+                self.get_recipes(user).order_by('-id')[:PAGE_SIZE]
+            ),
+            (
+                'recipes_by_author',
+                self.get_recipes(author=author.pk)[:PAGE_SIZE]
+            ),
+            (
+                'recipes_by_tag',
+                self.get_recipes(tags=[tag.slug])[:PAGE_SIZE]
+            ),
+            (
+                'recipes_favorited',
+                self.get_recipes(user, is_favorited=1)[:PAGE_SIZE]
+            ),
+            (
+                'recipes_in_cart',
+                self.get_recipes(user, is_in_shopping_cart=1)[:PAGE_SIZE]
+            ),
+            ('recipe', self.get_recipes(user).filter(pk=recipe.pk)),
+            (
+                'recipe_ingredients',
+                RecipeIngredient.objects.filter(
+                    recipe__in=[recipe.pk]
+                ).select_related('ingredient')
+            ),
+            (
+                'feed',
+                FeedEntry.objects.filter_feed(
+                    self.get_recipes(user), user
+                ).order_by('-id')[:PAGE_SIZE]
+            ),
+            (
+                'similar',
+                self.get_recipes(user).filter(
+                    neighbour_of__recipe=recipe
+                ).order_by('-neighbour_of__score', '-id')
+            ),
+            (
+                'favorite_rows',
+                Favorite.objects.filter(
+                    author=user, recipe__in=[recipe.pk]
+                ).values_list('recipe', flat=True)
+            ),
+            (
+                'shopping_cart_rows',
+                ShoppingCart.objects.filter(
+                    author=user, recipe__in=[recipe.pk]
+                ).values_list('recipe', flat=True)
+            ),
+            (
+                'shopping_list_totals',
+                RecipeIngredient.objects.filter(
+                    recipe__shopping_cart__author__in=[user]
+                ).values(
+                    'recipe__shopping_cart__author', 'ingredient'
+                ).annotate(total_amount=Sum('amount')).order_by()
+            ),
+            (
+                'shopping_list',
+                ShoppingListItem.objects.filter(author=user).values_list(
+                    'ingredient__name',
+                    'ingredient__measurement_unit',
+                    'total_amount'
+                ).order_by('ingredient__name', 'ingredient')
+            ),
+            (
+                'subscriptions',
+                User.objects.filter(
+                    id__in=user.subscriptions.values_list('author', flat=True)
+                ).order_by('id')[:PAGE_SIZE]
+            ),
+            (
+                'subscribers',
+                Subscription.objects.filter(
+                    author__in=[author]
+                ).values_list('user', 'author')
+            ),
+            (
+                'ingredients_by_name',
+                Ingredient.objects.filter(
+                    name__istartswith=ingredient.name[:2]
+                )
+            ),
+            ('short_link', ShortLink.objects.filter(code='000000')),
+        )
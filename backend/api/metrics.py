@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+SAMPLE_FIELDS = ('count', 'duration', 'queries', 'db_duration', 'size')
+
+
+current_timer = ContextVar('current_timer', default=None)
+
+
+class QueryTimer:
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.duration += time.perf_counter() - start
+
+
+def empty_sample():
+    return {
+        'buckets': [0] * len(LATENCY_BUCKETS),
+        **dict.fromkeys(SAMPLE_FIELDS, 0),
+    }
+
+
+def merge_samples(total, sample):
+    for index, value in enumerate(sample['buckets']):
+        total['buckets'][index] += value
+    for field in SAMPLE_FIELDS:
+        total[field] += sample[field]
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.samples = {}
+        self.flushed_at = 0
+        self.pid = None
+        self.file_name = None
+
+    def record(self, labels, duration, timer, size):
+        with self.lock:
+            sample = self.samples.setdefault(labels, empty_sample())
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    sample['buckets'][index] += 1
+            sample['count'] += 1
+            sample['duration'] += duration
+            sample['queries'] += timer.queries
+            sample['db_duration'] += timer.duration
+            sample['size'] += size
+        self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return json.dumps([
+                [*labels, sample] for labels, sample in self.samples.items()
+            ])
+
+    def get_path(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return None
+        # Forked workers inherit the registry, but must not share a file.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.file_name = f'{self.pid}-{uuid.uuid4().hex}.json'
+        return Path(directory) / self.file_name
+
+    def flush(self, force=False):
+        path = self.get_path()
+        if path is None:
+            return
+        with self.flush_lock:
+            now = time.monotonic()
+            if (
+                not force
+                and now - self.flushed_at < settings.METRICS_FLUSH_INTERVAL
+            ):
+                return
+            self.flushed_at = now
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_suffix('.tmp')
+            temporary.write_text(self.snapshot())
+            os.replace(temporary, path)
+
+    def collect(self):
+        path = self.get_path()
+        if path is None:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush(force=True)
+            snapshots = []
+            for worker_file in path.parent.glob('*.json'):
+                try:
+                    snapshots.append(worker_file.read_text())
+                except OSError:
+                    continue
+
+        samples = {}
+        for snapshot in snapshots:
+            try:
+                data = json.loads(snapshot)
+            except ValueError:
+                continue
+            for *labels, sample in data:
+                merge_samples(
+                    samples.setdefault(tuple(labels), empty_sample()), sample
+                )
+        return samples
+
+
+registry = MetricsRegistry()
+
+
+def time_query(execute, sql, params, many, context):
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+# Connections are per thread, and under ASGI queries run in sync_to_async
+# threads, so the wrapper sits on every connection and finds the request's
+# timer through a context variable that asgiref carries into those threads.
+@receiver(connection_created)
+def install_query_timer(connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.url_name or match.view_name
+
+
+class MetricsMiddleware:
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        token = current_timer.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.process_response(request, response, start, timer)
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        token = current_timer.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.process_response(request, response, start, timer)
+
+    def process_response(self, request, response, start, timer):
+        view = get_view_name(request)
+        if view is None:
+            return response
+        labels = (view, request.method, str(response.status_code))
+        if not response.streaming:
+            registry.record(
+                labels,
+                time.perf_counter() - start,
+                timer,
+                len(response.content)
+            )
+        elif response.is_async:
+            response.streaming_content = self.astream(
+                response.streaming_content, labels, start, timer
+            )
+        else:
+            response.streaming_content = self.stream(
+                response.streaming_content, labels, start, timer
+            )
+        return response
+
+    def stream(self, content, labels, start, timer):
+        size = 0
+        current_timer.set(timer)
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            # Generators may be closed from another context, where the
+            # token of set() is not valid.
+            current_timer.set(None)
+            registry.record(labels, time.perf_counter() - start, timer, size)
+
+    async def astream(self, content, labels, start, timer):
+        size = 0
+        current_timer.set(timer)
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            # Generators may be closed from another context, where the
+            # token of set() is not valid.
+            current_timer.set(None)
+            registry.record(labels, time.perf_counter() - start, timer, size)
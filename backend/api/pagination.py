@@ -1,7 +1,39 @@
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import QuerySet
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', self.ordering)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
 
 
 class CustomPagination(PageNumberPagination):
 
     page_size = 6
     page_size_query_param = 'limit'
+    cursor_pagination_class = KeysetPagination
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor_query_param = self.cursor_pagination_class.cursor_query_param
+        # Ranked lists built in memory have no ordering to key on.
+        if (cursor_query_param in request.query_params
+                and isinstance(queryset, QuerySet)):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
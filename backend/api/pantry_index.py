@@ -0,0 +1,197 @@
+import threading
+from array import array
+from collections import defaultdict
+
+import numpy as np
+
+from recipes.models import RecipeChange, RecipeIngredient
+
+
+# Changed recipes are searched one by one until there are this many; then
+# the index is rebuilt around them.
+MAX_PENDING_RECIPES = 10000
+
+
+def fetch(recipe_ingredients):
+    recipes, ingredients = array('q'), array('q')
+    rows = recipe_ingredients.values_list('recipe', 'ingredient').order_by()
+    for recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+        recipes.append(recipe_id)
+        ingredients.append(ingredient_id)
+    return (
+        np.array(recipes, dtype=np.int64),
+        np.array(ingredients, dtype=np.int64),
+    )
+
+
+class Snapshot:
+
+    # Never changed once built, so searches read it without locking.
+    def __init__(self, sequence, recipe_ids, sizes, postings, dead, pending):
+        self.sequence = sequence
+        self.recipe_ids = recipe_ids
+        self.sizes = sizes
+        self.postings = postings
+        self.dead = dead
+        self.pending = pending
+
+
+class Matches:
+
+    # Pagination only slices, so only the requested page becomes tuples.
+    def __init__(self, recipe_ids, missing):
+        self.recipe_ids = recipe_ids
+        self.missing = missing
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def __getitem__(self, index):
+        return list(zip(
+            self.recipe_ids[index].tolist(), self.missing[index].tolist()
+        ))
+
+
+class PantryIndex:
+
+    def __init__(self, sequence):
+        recipes, ingredients = fetch(RecipeIngredient.objects.all())
+        recipe_ids, rows, sizes = np.unique(
+            recipes, return_inverse=True, return_counts=True
+        )
+        # Postings are slices of one array of rows, grouped by ingredient.
+        order = np.argsort(ingredients, kind='stable')
+        ingredient_ids, starts = np.unique(
+            ingredients[order], return_index=True
+        )
+        postings = dict(zip(
+            ingredient_ids.tolist(),
+            np.split(rows[order].astype(np.int32), starts[1:]),
+        ))
+        self.lock = threading.Lock()
+        self.snapshot = Snapshot(
+            sequence,
+            recipe_ids,
+            sizes,
+            postings,
+            np.zeros(len(recipe_ids), dtype=bool),
+            {},
+        )
+
+    @property
+    def sequence(self):
+        return self.snapshot.sequence
+
+    @property
+    def pending(self):
+        return len(self.snapshot.pending)
+
+    def update(self, sequence, recipe_ids):
+        recipes, ingredients = fetch(
+            RecipeIngredient.objects.filter(recipe__in=recipe_ids)
+        )
+        changed = defaultdict(set)
+        for recipe_id, ingredient_id in zip(
+            recipes.tolist(), ingredients.tolist()
+        ):
+            changed[recipe_id].add(ingredient_id)
+
+        # Only writers queue here; searches keep reading the old snapshot
+        # until the new one replaces it.
+        with self.lock:
+            snapshot = self.snapshot
+            # Another request may have applied the same or newer changes.
+            if sequence <= snapshot.sequence:
+                return
+            ids = np.array(sorted(recipe_ids), dtype=np.int64)
+            rows = np.searchsorted(snapshot.recipe_ids, ids)
+            rows = rows[rows < len(snapshot.recipe_ids)]
+            dead = snapshot.dead.copy()
+            dead[rows[snapshot.recipe_ids[rows] == ids[:len(rows)]]] = True
+            pending = {
+                recipe_id: ingredient_ids
+                for recipe_id, ingredient_ids in snapshot.pending.items()
+                if recipe_id not in recipe_ids
+            }
+            pending.update(
+                (recipe_id, frozenset(ingredient_ids))
+                for recipe_id, ingredient_ids in changed.items()
+            )
+            self.snapshot = Snapshot(
+                sequence,
+                snapshot.recipe_ids,
+                snapshot.sizes,
+                snapshot.postings,
+                dead,
+                pending,
+            )
+
+    def search(self, pantry, max_missing):
+        snapshot = self.snapshot
+        postings = [
+            snapshot.postings[ingredient_id]
+            for ingredient_id in pantry
+            if ingredient_id in snapshot.postings
+        ]
+        matched = np.bincount(
+            np.concatenate(postings) if postings
+            else np.zeros(0, dtype=np.int32),
+            minlength=len(snapshot.recipe_ids),
+        )
+        # Recipes that share nothing with the pantry count too, as long as
+        # they miss few enough ingredients.
+        missing = snapshot.sizes - matched
+        rows = np.flatnonzero((missing <= max_missing) & ~snapshot.dead)
+        recipe_ids = [snapshot.recipe_ids[rows]]
+        found_missing = [missing[rows]]
+        found_matched = [matched[rows]]
+
+        pending = [], [], []
+        for recipe_id, ingredient_ids in snapshot.pending.items():
+            count = len(pantry.intersection(ingredient_ids))
+            if len(ingredient_ids) - count <= max_missing:
+                pending[0].append(recipe_id)
+                pending[1].append(len(ingredient_ids) - count)
+                pending[2].append(count)
+        recipe_ids = np.concatenate(recipe_ids + [np.array(
+            pending[0], dtype=np.int64
+        )])
+        found_missing = np.concatenate(found_missing + [np.array(
+            pending[1], dtype=np.int64
+        )])
+        found_matched = np.concatenate(found_matched + [np.array(
+            pending[2], dtype=np.int64
+        )])
+        # Fewest missing first, then most matched, then newest.
+        order = np.lexsort((-recipe_ids, -found_matched, found_missing))
+        return Matches(recipe_ids[order], found_missing[order])
+
+
+_index = None
+_build_lock = threading.Lock()
+
+
+def get_pantry_index():
+    global _index
+    sequence = RecipeChange.objects.last_sequence()
+    index = _index
+    stale = index is None
+    # Another request may already have moved the index past sequence.
+    if index is not None and index.sequence < sequence:
+        changes = RecipeChange.objects.get_changes(index.sequence, sequence)
+        if changes is None:
+            stale = True
+        else:
+            index.update(sequence, changes)
+    if not stale and index.pending <= MAX_PENDING_RECIPES:
+        return index
+
+    # The first build is waited for; otherwise other requests keep
+    # searching the old index while one of them builds the new one.
+    if _build_lock.acquire(blocking=index is None):
+        try:
+            if _index is index:
+                _index = PantryIndex(sequence)
+        finally:
+            _build_lock.release()
+    return _index
@@ -1,3 +1,6 @@
+import hmac
+
+from django.conf import settings
 from rest_framework import permissions
 
 
@@ -10,3 +13,12 @@ class AdminOrAuthorOrReadOnly(permissions.BasePermission):
         return (request.method in permissions.SAFE_METHODS
                 or (request.user.is_authenticated
                     and (obj.author == request.user)))
+
+
+class AdminOrMetricsToken(permissions.BasePermission):
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        authorization = request.headers.get('Authorization', '')
+        return (request.user.is_staff
+                or (bool(token)
+                    and hmac.compare_digest(authorization, f'Bearer {token}')))
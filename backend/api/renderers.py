@@ -0,0 +1,117 @@
+import csv
+import json
+
+from rest_framework import renderers
+
+from .metrics import LATENCY_BUCKETS
+
+
+def escape_label(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListTextRenderer(renderers.BaseRenderer):
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data)
+
+    def stream(self, rows):
+        for name, measurement_unit, amount in rows:
+            yield f'{name} ({measurement_unit}) — {amount}\n'
+
+
+class ShoppingListCSVRenderer(ShoppingListTextRenderer):
+
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('Ingredient', 'Measurement unit', 'Amount')
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.header)
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class ShoppingListJSONRenderer(renderers.JSONRenderer):
+
+    keys = ('name', 'measurement_unit', 'amount')
+
+    def stream(self, rows):
+        separator = '['
+        for row in rows:
+            yield separator + json.dumps(
+                dict(zip(self.keys, row)), ensure_ascii=False
+            )
+            separator = ','
+        yield ']' if separator == ',' else '[]'
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+
+    media_type = 'text/plain'
+    format = 'prometheus'
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+    prefix = 'foodgram_'
+    counters = (
+        ('db_queries_total', 'queries', 'Количество SQL-запросов.'),
+        (
+            'db_query_duration_seconds_total',
+            'db_duration',
+            'Время выполнения SQL-запросов.'
+        ),
+        (
+            'http_response_size_bytes_total',
+            'size',
+            'Размер тела ответов.'
+        ),
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, list):
+            return str(data)
+        return ''.join(self.lines(data))
+
+    def format_labels(self, labels, **extra):
+        view, method, status = labels
+        pairs = {'view': view, 'method': method, 'status': status, **extra}
+        return '{' + ','.join(
+            f'{name}="{escape_label(value)}"'
+            for name, value in pairs.items()
+        ) + '}'
+
+    def lines(self, samples):
+        name = f'{self.prefix}http_request_duration_seconds'
+        yield f'# HELP {name} Время обработки запроса.\n'
+        yield f'# TYPE {name} histogram\n'
+        for labels, sample in samples:
+            bounds = (*LATENCY_BUCKETS, '+Inf')
+            values = (*sample['buckets'], sample['count'])
+            for bound, value in zip(bounds, values):
+                bucket_labels = self.format_labels(labels, le=bound)
+                yield f'{name}_bucket{bucket_labels} {value}\n'
+            label_text = self.format_labels(labels)
+            yield f'{name}_sum{label_text} {sample["duration"]}\n'
+            yield f'{name}_count{label_text} {sample["count"]}\n'
+
+        for suffix, field, description in self.counters:
+            name = f'{self.prefix}{suffix}'
+            yield f'# HELP {name} {description}\n'
+            yield f'# TYPE {name} counter\n'
+            for labels, sample in samples:
+                label_text = self.format_labels(labels)
+                yield f'{name}{label_text} {sample[field]}\n'
@@ -1,25 +1,32 @@
-import base64
-
 from rest_framework import serializers
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from django.core.files.base import ContentFile
+from django.db import transaction
 
 from recipes.models import (
     Ingredient,
     RecipeIngredient,
     Recipe,
+    RecipeChange,
     Tag,
     ShoppingCart,
-    Favorite
+    ShoppingListItem,
+    Favorite,
+    FeedEntry
 )
+from recipes.search import index_recipes
+from recipes.versions import RECIPES, bump_version
 from users.models import User
 from .utils import is_subscribed
-from .fields import Base64ImageField
+from .fields import Base64ImageField, ImageVariantsField
+
+
+RECIPE_BULK_MAX_SIZE = 1000
 
 
 class CustomUserSerializer(UserSerializer):
 
     avatar = Base64ImageField(required=False)
+    avatar_variants = ImageVariantsField(source='avatar')
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed'
     )
@@ -33,17 +40,16 @@ class CustomUserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'avatar',
+            'avatar_variants',
             'is_subscribed',
         )
 
     def update(self, instance, validated_data):
 
-        avatar_data = validated_data.pop('avatar', None)
-        if avatar_data:
-            format, imgstr = avatar_data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name=f'avatar.{ext}')
-            instance.avatar.save(f'avatar.{ext}', data, save=True)
+        avatar = validated_data.pop('avatar', None)
+        if avatar:
+            instance.avatar.delete(save=False)
+            instance.avatar.save('avatar', avatar, save=True)
             return super().update(instance, validated_data)
         else:
             raise serializers.ValidationError(
@@ -77,8 +83,9 @@ class CustomUserCreateSerializer(UserCreateSerializer):
 class SubscriptionSerializer(serializers.ModelSerializer):
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
     is_subscribed = serializers.SerializerMethodField()
+    avatar_variants = ImageVariantsField(source='avatar')
 
     class Meta:
         model = User
@@ -92,6 +99,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             'recipes',
             'recipes_count',
             'avatar',
+            'avatar_variants',
         )
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
 
@@ -112,7 +120,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
         recipes = obj.recipes.all()
-        if limit:
+        if limit and limit.isdigit():
             recipes = recipes[: int(limit)]
         serializer = ShoppingCartRecipeSerializer(
             recipes,
@@ -121,9 +129,6 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         )
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class TagSerializer(serializers.ModelSerializer):
 
@@ -161,6 +166,7 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         source='recipe_ingredients'
     )
     image = Base64ImageField()
+    image_variants = ImageVariantsField(source='image')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -168,23 +174,45 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'name', 'image',
-            'text', 'cooking_time', 'is_favorited', 'is_in_shopping_cart'
+            'image_variants', 'text', 'cooking_time', 'is_favorited',
+            'is_in_shopping_cart'
         )
 
     def get_is_favorited(self, obj):
         user = self.context['request'].user
-        if user.is_authenticated:
-            return Favorite.objects.filter(author=user, recipe=obj).exists()
-        return False
+        if not user.is_authenticated:
+            return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return Favorite.objects.filter(author=user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
         user = self.context['request'].user
-        if user.is_authenticated:
-            return ShoppingCart.objects.filter(
-                author=user,
-                recipe=obj
-            ).exists()
-        return False
+        if not user.is_authenticated:
+            return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return ShoppingCart.objects.filter(author=user, recipe=obj).exists()
+
+
+class PantryRecipeSerializer(RecipeGetSerializer):
+
+    missing = serializers.ReadOnlyField()
+
+    class Meta(RecipeGetSerializer.Meta):
+        fields = RecipeGetSerializer.Meta.fields + ('missing',)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=RECIPE_BULK_MAX_SIZE,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
 
 
 class IngredientsAmountSerializer(serializers.ModelSerializer):
@@ -204,12 +232,81 @@ class IngredientsAmountSerializer(serializers.ModelSerializer):
         return value
 
 
+def collect_ids(items):
+    ids = set()
+    for item in items if isinstance(items, list) else ():
+        if isinstance(item, dict):
+            item = item.get('id')
+        try:
+            ids.add(int(item))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+class CreateRecipeListSerializer(serializers.ListSerializer):
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            recipes = [item for item in data if isinstance(item, dict)]
+            ingredient_ids = set().union(*(
+                collect_ids(recipe.get('ingredients')) for recipe in recipes
+            ))
+            tag_ids = set().union(*(
+                collect_ids(recipe.get('tags')) for recipe in recipes
+            ))
+            self.context['existing_ids'] = {
+                Ingredient: set(
+                    Ingredient.objects.filter(
+                        id__in=ingredient_ids
+                    ).values_list('id', flat=True)
+                ),
+                Tag: set(
+                    Tag.objects.filter(
+                        id__in=tag_ids
+                    ).values_list('id', flat=True)
+                ),
+            }
+        return super().to_internal_value(data)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        recipes = []
+        tags = []
+        ingredients = []
+        for attrs in validated_data:
+            attrs = dict(attrs)
+            tags.append(attrs.pop('tags'))
+            ingredients.append(attrs.pop('ingredients'))
+            recipes.append(Recipe(**attrs))
+
+        recipes = Recipe.objects.bulk_create(recipes)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+            for recipe, tag_ids in zip(recipes, tags)
+            for tag_id in tag_ids
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient['id'],
+                amount=ingredient['amount']
+            )
+            for recipe, recipe_ingredients in zip(recipes, ingredients)
+            for ingredient in recipe_ingredients
+        )
+        index_recipes(recipes)
+        FeedEntry.objects.fan_out(recipes)
+        transaction.on_commit(lambda: bump_version(RECIPES))
+        transaction.on_commit(lambda: RecipeChange.objects.log(
+            [recipe.id for recipe in recipes]
+        ))
+        return recipes
+
+
 class CreateRecipeSerializer(serializers.ModelSerializer):
 
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     author = CustomUserSerializer(read_only=True)
     ingredients = IngredientsAmountSerializer(many=True)
     image = Base64ImageField()
@@ -220,17 +317,20 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             'tags', 'author', 'ingredients', 'name',
             'image', 'text', 'cooking_time'
         )
+        list_serializer_class = CreateRecipeListSerializer
+
+    def get_existing_ids(self, model, ids):
+        existing_ids = self.context.get('existing_ids', {}).get(model)
+        if existing_ids is None:
+            existing_ids = set(
+                model.objects.filter(id__in=ids).values_list('id', flat=True)
+            )
+        return existing_ids
 
     def validate_ingredients(self, value):
         if not value:
             raise serializers.ValidationError('Рецепт без ингредиентов.')
 
-        for ingredient in value:
-            if not Ingredient.objects.filter(id=ingredient['id']).exists():
-                raise serializers.ValidationError(
-                    f'Ингредиент {ingredient["id"]} не существует.'
-                )
-
         ingredient_ids = set()
         for ingredient in value:
             ingredient_id = ingredient['id']
@@ -239,25 +339,31 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
                     f'Ингредиент с ID {ingredient_id} уже добавлен.'
                 )
             ingredient_ids.add(ingredient_id)
+
+        missing = ingredient_ids - self.get_existing_ids(
+            Ingredient, ingredient_ids
+        )
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиент {min(missing)} не существует.'
+            )
         return value
 
     def validate_tags(self, value):
         if not value:
             raise serializers.ValidationError('Рецепт без Тегов.')
 
-        for tag in value:
-            if not Tag.objects.filter(name=tag).exists():
-                raise serializers.ValidationError(
-                    f'Данного тэга {tag} нет в списке доступных.'
-                )
+        tag_ids = set(value)
+        if len(tag_ids) != len(value):
+            raise serializers.ValidationError(
+                'Повторяющих тегов не должно быть.'
+            )
 
-        set_value = set()
-        for item in value:
-            if item in set_value:
-                raise serializers.ValidationError(
-                    'Повторяющих тегов не должно быть.'
-                )
-            set_value.add(item)
+        missing = tag_ids - self.get_existing_ids(Tag, tag_ids)
+        if missing:
+            raise serializers.ValidationError(
+                f'Данного тэга {min(missing)} нет в списке доступных.'
+            )
         return value
 
     def add_recipe_ingredients(self, ingredients, recipe):
@@ -271,6 +377,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         ]
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
@@ -278,20 +385,73 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags_data)
         self.add_recipe_ingredients(ingredients_data, recipe)
+        FeedEntry.objects.fan_out([recipe])
 
         return recipe
 
+    def update_recipe_ingredients(self, ingredients, recipe):
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        submitted = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+
+        removed = current.keys() - submitted.keys()
+        added = submitted.keys() - current.keys()
+        changed = [
+            recipe_ingredient
+            for ingredient_id, recipe_ingredient in current.items()
+            if ingredient_id in submitted
+            and recipe_ingredient.amount != submitted[ingredient_id]
+        ]
+        for recipe_ingredient in changed:
+            recipe_ingredient.amount = submitted[
+                recipe_ingredient.ingredient_id
+            ]
+
+        if removed:
+            recipe.recipe_ingredients.filter(
+                ingredient_id__in=removed
+            ).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        if added:
+            self.add_recipe_ingredients(
+                [
+                    ingredient for ingredient in ingredients
+                    if ingredient['id'] in added
+                ],
+                recipe
+            )
+        return removed | added | {
+            recipe_ingredient.ingredient_id for recipe_ingredient in changed
+        }
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients_data = validated_data.pop('ingredients', None)
 
         instance = super().update(instance, validated_data)
 
-        instance.ingredients.clear()
-        self.add_recipe_ingredients(ingredients_data, instance)
+        if ingredients_data is not None:
+            changed_ingredients = self.update_recipe_ingredients(
+                ingredients_data, instance
+            )
+            if changed_ingredients:
+                Recipe.objects.filter(pk=instance.pk).update(
+                    neighbours_stale=True
+                )
+                ShoppingListItem.objects.refresh(
+                    User.objects.filter(shopping_cart__recipe=instance),
+                    changed_ingredients
+                )
 
-        instance.tags.clear()
-        instance.tags.set(tags)
+        if tags is not None:
+            instance.tags.set(tags)
 
         return instance
 
@@ -304,7 +464,8 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
 class ShoppingCartRecipeSerializer(serializers.ModelSerializer):
 
     image = Base64ImageField()
+    image_variants = ImageVariantsField(source='image')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
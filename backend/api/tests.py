@@ -0,0 +1,670 @@
+import asyncio
+import base64
+import io
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from recipes.models import (
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    Recipe,
+    RecipeChange,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListItem,
+    ShortLink,
+    Tag
+)
+from users.models import Subscription, User
+from recipes.search import FTS_TABLE, index_recipes
+from recipes.versions import (
+    INGREDIENTS,
+    LOCAL_CACHE_TIMEOUT,
+    bump_version,
+    get_timeout
+)
+from . import ingredient_index, pantry_index, views
+from .utils import encode_short_link
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        first_name='Имя',
+        last_name='Фамилия',
+        password='password',
+    )
+
+
+def create_recipes(author, count):
+    return Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {number}',
+            text='Описание',
+            cooking_time=10,
+            image='recipes/test.jpg',
+        )
+        for number in range(count)
+    )
+
+
+class RecipeQueryCountTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        authors = [create_user(f'author{number}') for number in range(3)]
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(5)
+        )
+        recipes = []
+        for author in authors:
+            recipes.extend(create_recipes(author, 4))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in tags[:2]
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes
+            for ingredient in ingredients[:3]
+        )
+        Favorite.objects.create(author=cls.user, recipe=recipes[0])
+        ShoppingCart.objects.create(author=cls.user, recipe=recipes[1])
+        Subscription.objects.create(user=cls.user, author=authors[0])
+        cls.recipe = recipes[0]
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        # Anonymous responses are cached; every request here must miss.
+        cache.clear()
+
+    def assert_list_queries(self, count):
+        for limit in (1, 5, 12):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(count):
+                    response = self.client.get(
+                        reverse('api:recipes-list'), {'limit': limit}
+                    )
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_list_anonymous(self):
+        self.assert_list_queries(5)
+
+    def test_list_authenticated(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        self.assert_list_queries(7)
+
+    def test_detail_anonymous(self):
+        with self.assertNumQueries(4):
+            self.client.get(
+                reverse('api:recipes-detail', args=(self.recipe.id,))
+            )
+
+    def test_detail_authenticated(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        with self.assertNumQueries(6):
+            response = self.client.get(
+                reverse('api:recipes-detail', args=(self.recipe.id,))
+            )
+        self.assertTrue(response.data['is_favorited'])
+        self.assertTrue(response.data['author']['is_subscribed'])
+
+
+class RecipeSearchTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.borscht, cls.shchi, cls.pancakes = Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=name,
+                text=text,
+                cooking_time=10,
+                image='recipes/test.jpg',
+            )
+            for name, text in (
+                ('Борщ', 'свёкла, капуста и капуста'),
+                ('Щи', 'капуста'),
+                ('Блины', 'мука и молоко'),
+            )
+        )
+        index_recipes((cls.borscht, cls.shchi, cls.pancakes))
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, value):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('api:recipes-list'), {'search': value}
+            )
+        self.assertEqual(len(queries), 4)
+        return [recipe['id'] for recipe in response.data['results']], [
+            query['sql'] for query in queries
+        ]
+
+    def test_full_text_search(self):
+        found, queries = self.search('капуста')
+        self.assertCountEqual(found, (self.borscht.id, self.shchi.id))
+        self.assertTrue(any(
+            f'{FTS_TABLE} MATCH' in query for query in queries
+        ))
+        self.assertFalse(any('LIKE' in query for query in queries))
+
+    @mock.patch('recipes.search.connection', mock.Mock(vendor='mysql'))
+    def test_fallback_search(self):
+        found, queries = self.search('мука')
+        self.assertEqual(found, [self.pancakes.id])
+        self.assertFalse(any(FTS_TABLE in query for query in queries))
+        self.assertTrue(any('LIKE' in query for query in queries))
+
+
+class RecipeCacheTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.recipe, = create_recipes(cls.user, 1)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_favorites_keep_anonymous_cache(self):
+        url = reverse('api:recipes-list')
+        self.client.get(url)
+        user_client = self.client_class()
+        user_client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        with self.captureOnCommitCallbacks(execute=True):
+            user_client.post(
+                reverse('api:recipes-favorite', args=(self.recipe.id,))
+            )
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_unused_parameters_share_the_cache_entry(self):
+        url = reverse('api:recipes-list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'utm_source': 'mail'})
+        self.assertEqual(response['ETag'], etag)
+        self.assertNotEqual(self.client.get(url, {'limit': 1})['ETag'], etag)
+
+    def test_author_saves_keep_anonymous_cache(self):
+        url = reverse('api:recipes-list')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_user('newcomer')
+            self.user.set_password('new-password')
+            self.user.save()
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Другое'
+            self.user.save()
+        response = self.client.get(url)
+        self.assertEqual(
+            response.data['results'][0]['author']['first_name'], 'Другое'
+        )
+
+    def test_recipe_change_invalidates_anonymous_cache(self):
+        url = reverse('api:recipes-list')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.get(pk=self.recipe.pk).save()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertTrue(queries)
+
+
+@override_settings(FEED_FANOUT_THRESHOLD=2)
+class FeedTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.recipes = create_recipes(cls.author, 3)
+        cls.first = create_user('first')
+        cls.second = create_user('second')
+
+    def subscribe(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.post(
+            reverse('api:users-subscribe', args=(self.author.id,))
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def get_feed(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('api:recipes-feed'))
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_follow_at_threshold_reads_from_author(self):
+        self.subscribe(self.first)
+        self.subscribe(self.second)
+        expected = sorted((recipe.id for recipe in self.recipes), reverse=True)
+        self.assertEqual(FeedEntry.objects.filter(user=self.first).count(), 3)
+        # The second follower takes the author to the threshold.
+        self.assertFalse(FeedEntry.objects.filter(user=self.second).exists())
+        self.assertEqual(self.get_feed(self.first), expected)
+        self.assertEqual(self.get_feed(self.second), expected)
+
+    def test_fan_out_skips_popular_authors(self):
+        self.subscribe(self.first)
+        recipe, = create_recipes(self.author, 1)
+        FeedEntry.objects.fan_out([recipe])
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.first, recipe=recipe).exists()
+        )
+        self.subscribe(self.second)
+        recipe, = create_recipes(self.author, 1)
+        # One primary key lookup of the author's counter, nothing else.
+        with self.assertNumQueries(1):
+            FeedEntry.objects.fan_out([recipe])
+        self.assertFalse(FeedEntry.objects.filter(recipe=recipe).exists())
+
+
+class IngredientIndexTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in (
+                'Ванильный сахар',
+                'Сахар ванильный',
+                'Сахар',
+                'Мёд',
+                'Соль',
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+        ingredient_index._index = None
+
+    def search(self, name):
+        return [
+            ingredient['name']
+            for ingredient in ingredient_index.get_ingredient_index().search(
+                name
+            )
+        ]
+
+    def test_name_prefix_ranks_before_word_prefix(self):
+        self.assertEqual(self.search('сахар'), [
+            'Сахар', 'Сахар ванильный', 'Ванильный сахар'
+        ])
+        self.assertEqual(self.search('ван'), [
+            'Ванильный сахар', 'Сахар ванильный'
+        ])
+
+    def test_case_and_yo_are_folded(self):
+        for name in ('мед', 'МЕД', 'мёд', 'МЁ'):
+            with self.subTest(name=name):
+                self.assertEqual(self.search(name), ['Мёд'])
+
+    def test_results_are_capped(self):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Перец {number:02}', measurement_unit='г')
+            for number in range(ingredient_index.AUTOCOMPLETE_LIMIT + 10)
+        )
+        bump_version(INGREDIENTS)
+        found = self.search('перец')
+        self.assertEqual(len(found), ingredient_index.AUTOCOMPLETE_LIMIT)
+        self.assertEqual(found[0], 'Перец 00')
+
+    def test_version_bump_reloads_the_index(self):
+        index = ingredient_index.get_ingredient_index()
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Соль морская', measurement_unit='г')]
+        )
+        self.assertEqual(self.search('соль'), ['Соль'])
+        bump_version(INGREDIENTS)
+        self.assertEqual(self.search('соль'), ['Соль', 'Соль морская'])
+        self.assertIsNot(ingredient_index.get_ingredient_index(), index)
+
+    def test_matches_the_orm_without_queries(self):
+        ingredient_index.get_ingredient_index()
+        with self.assertNumQueries(0):
+            found = self.search('Сахар')
+        expected = Ingredient.objects.filter(
+            name__startswith='Сахар'
+        ).values_list('name', flat=True)
+        # Word prefixes come after everything the ORM lookup finds.
+        self.assertCountEqual(found[:len(expected)], expected)
+
+
+class PantryTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.salt, cls.flour, cls.milk = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Соль', 'Мука', 'Молоко')
+        )
+        cls.bread, cls.pancake = create_recipes(author, 2)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe, ingredients in (
+                (cls.bread, (cls.salt, cls.flour)),
+                (cls.pancake, (cls.flour, cls.milk)),
+            )
+            for ingredient in ingredients
+        )
+
+    def setUp(self):
+        pantry_index._index = None
+
+    def search(self, ingredients, missing=0):
+        response = self.client.get(
+            reverse('api:recipes-pantry'),
+            {'ingredients': [ingredient.id for ingredient in ingredients],
+             'missing': missing}
+        )
+        return [
+            (recipe['id'], recipe['missing'])
+            for recipe in response.data['results']
+        ]
+
+    def test_search(self):
+        self.assertEqual(
+            self.search((self.salt, self.flour)), [(self.bread.id, 0)]
+        )
+        self.assertEqual(self.search((self.flour,), missing=1), [
+            (self.pancake.id, 1), (self.bread.id, 1)
+        ])
+
+    def test_changes_update_the_index_in_place(self):
+        self.search((self.flour,))
+        index = pantry_index._index
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.create(
+                recipe=self.bread, ingredient=self.milk, amount=1
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.filter(
+                recipe=self.pancake, ingredient=self.flour
+            ).delete()
+        self.assertEqual(self.search((self.milk,)), [(self.pancake.id, 0)])
+        self.assertIs(pantry_index._index, index)
+        self.assertEqual(self.search((self.salt, self.flour, self.milk)), [
+            (self.bread.id, 0), (self.pancake.id, 0)
+        ])
+
+    def test_recipes_sharing_nothing_with_the_pantry(self):
+        self.assertEqual(self.search((self.milk,), missing=2), [
+            (self.pancake.id, 1), (self.bread.id, 2)
+        ])
+
+    def test_too_many_pending_recipes_rebuild_the_index(self):
+        self.search((self.flour,))
+        index = pantry_index._index
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.create(
+                recipe=self.bread, ingredient=self.milk, amount=1
+            )
+        with mock.patch.object(pantry_index, 'MAX_PENDING_RECIPES', 0):
+            self.assertEqual(self.search((self.salt, self.flour, self.milk)), [
+                (self.bread.id, 0), (self.pancake.id, 0)
+            ])
+        self.assertIsNot(pantry_index._index, index)
+        self.assertEqual(pantry_index._index.pending, 0)
+
+    def test_one_change_per_transaction(self):
+        sequence = RecipeChange.objects.last_sequence()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bread.delete()
+        self.assertEqual(RecipeChange.objects.last_sequence(), sequence + 1)
+
+    def test_gap_rebuilds_the_index(self):
+        self.search((self.flour,))
+        index = pantry_index._index
+        RecipeIngredient.objects.filter(recipe=self.pancake).delete()
+        RecipeChange.objects.reset()
+        self.assertEqual(self.search((self.flour,), missing=1), [
+            (self.bread.id, 1)
+        ])
+        self.assertIsNot(pantry_index._index, index)
+
+    def test_logged_changes_get_distinct_sequences(self):
+        first = RecipeChange.objects.log([self.bread.id])
+        second = RecipeChange.objects.log([self.pancake.id])
+        self.assertEqual(second, first + 1)
+        self.assertEqual(
+            RecipeChange.objects.get_changes(first - 1, second),
+            {self.bread.id, self.pancake.id}
+        )
+        RecipeChange.objects.reset()
+        self.assertIsNone(RecipeChange.objects.get_changes(
+            second, RecipeChange.objects.last_sequence()
+        ))
+
+
+class ReferenceCacheTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        Ingredient.objects.create(name='Сахар', measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_requests_hit_the_cache(self):
+        for url, params in (
+            (reverse('api:tags-list'), {}),
+            (reverse('api:tags-detail', args=(self.tag.id,)), {}),
+            (reverse('api:ingredients-list'), {}),
+            (reverse('api:ingredients-list'), {'name': 'сах'}),
+        ):
+            with self.subTest(url=url, params=params):
+                first = self.client.get(url, params)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url, params)
+                self.assertEqual(second.status_code, 200)
+                self.assertEqual(second.data, first.data)
+                self.assertEqual(second['ETag'], first['ETag'])
+
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, params, HTTP_IF_NONE_MATCH=first['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_change_invalidates_the_cache(self):
+        url = reverse('api:tags-list')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Обед', slug='lunch')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data), 2)
+
+    def test_local_memory_cache_expires_soon(self):
+        self.assertEqual(get_timeout(None), LOCAL_CACHE_TIMEOUT)
+        self.assertEqual(get_timeout(60 * 60 * 24), LOCAL_CACHE_TIMEOUT)
+        with self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/tmp/foodgram_test_cache',
+        }}):
+            self.assertIsNone(get_timeout(None))
+            self.assertEqual(get_timeout(60), 60)
+
+
+class ShortLinkTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+
+    def get_link(self, code):
+        return self.client.get(reverse('short_link', kwargs={'code': code}))
+
+    def test_redirect_cost_does_not_grow_with_recipes(self):
+        for total in (10, 1000):
+            create_recipes(self.author, total - Recipe.objects.count())
+            recipe = Recipe.objects.order_by('-id').first()
+            with self.assertNumQueries(1):
+                response = self.get_link(encode_short_link(recipe.id))
+            self.assertRedirects(
+                response,
+                f'/recipes/{recipe.id}/',
+                fetch_redirect_response=False
+            )
+
+    def test_legacy_code_is_one_lookup(self):
+        recipe, = create_recipes(self.author, 1)
+        ShortLink.objects.create(code='a1b2c3', recipe=recipe)
+        with self.assertNumQueries(1):
+            response = self.get_link('a1b2c3')
+        self.assertRedirects(
+            response, f'/recipes/{recipe.id}/', fetch_redirect_response=False
+        )
+
+    def test_new_codes_never_take_the_legacy_length(self):
+        recipe, = create_recipes(self.author, 1)
+        Recipe.objects.filter(pk=recipe.pk).update(id=62 ** 5)
+        code = encode_short_link(62 ** 5)
+        self.assertEqual(code, '0100000')
+        self.assertRedirects(
+            self.get_link(code),
+            f'/recipes/{62 ** 5}/',
+            fetch_redirect_response=False
+        )
+        # Six characters are only ever looked up among legacy codes.
+        self.assertEqual(self.get_link('100000').status_code, 404)
+
+    def test_unknown_code_is_not_found(self):
+        for code in ('zzzzz', 'zzzzzzzzzzz', 'z' * 24, 'abc-'):
+            with self.subTest(code=code):
+                self.assertEqual(self.get_link(code).status_code, 404)
+
+
+def image_data_uri():
+    content = io.BytesIO()
+    Image.new('RGB', (32, 32), 'red').save(content, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        content.getvalue()
+    ).decode()
+
+
+@override_settings(
+    ROOT_URLCONF='foodgram.asgi_urls', MEDIA_ROOT=tempfile.mkdtemp()
+)
+class AsyncViewTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.recipe, = create_recipes(cls.user, 1)
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=ingredient, amount=5
+        )
+        cls.headers = {
+            'Authorization': f'Token {Token.objects.create(user=cls.user)}'
+        }
+
+    def test_only_the_asgi_urlconf_is_async(self):
+        for path in (
+            f'/api/recipes/{self.recipe.id}/favorite/',
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+            '/api/users/me/avatar/',
+            '/s/abc/',
+        ):
+            with self.subTest(path=path):
+                self.assertTrue(asyncio.iscoroutinefunction(
+                    resolve(path, 'foodgram.asgi_urls').func
+                ))
+                self.assertFalse(asyncio.iscoroutinefunction(
+                    resolve(path, 'foodgram.urls').func
+                ))
+        self.assertIs(resolve('/s/abc/', 'foodgram.urls').func,
+                      views.short_link)
+
+    async def test_favorite_toggle(self):
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        response = await self.async_client.post(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+        response = await self.async_client.post(url, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['id'], self.recipe.id)
+        response = await self.async_client.post(url, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        recipe = await Recipe.objects.aget(pk=self.recipe.pk)
+        self.assertEqual(recipe.favorites_count, 1)
+
+        response = await self.async_client.delete(url, headers=self.headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(await Favorite.objects.aexists())
+        response = await self.async_client.post(
+            '/api/recipes/0/favorite/', headers=self.headers
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_shopping_cart_refreshes_the_list(self):
+        response = await self.async_client.post(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+            headers=self.headers
+        )
+        self.assertEqual(response.status_code, 201)
+        item = await ShoppingListItem.objects.aget(author=self.user)
+        self.assertEqual(item.total_amount, 5)
+
+    async def test_avatar(self):
+        url = '/api/users/me/avatar/'
+        response = await self.async_client.put(
+            url, {'avatar': image_data_uri()},
+            content_type='application/json', headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/media/avatars/', response.json()['avatar'])
+        response = await self.async_client.put(
+            url, {'avatar': 'nope'},
+            content_type='application/json', headers=self.headers
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('avatar', response.json())
+
+        response = await self.async_client.delete(url, headers=self.headers)
+        self.assertEqual(response.status_code, 204)
+        user = await User.objects.aget(pk=self.user.pk)
+        self.assertFalse(user.avatar)
+
+    async def test_short_link(self):
+        response = await self.async_client.get(
+            f'/s/{encode_short_link(self.recipe.id)}/'
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], f'/recipes/{self.recipe.id}/')
+        response = await self.async_client.get('/s/zzzzz/')
+        self.assertEqual(response.status_code, 404)
@@ -4,6 +4,7 @@ from rest_framework import routers
 from .views import (
     CustomUserViewSet,
     IngredientViewSet,
+    MetricsView,
     RecipeViewSet,
     TagViewSet,
 )
@@ -20,6 +21,7 @@ router.register('users', CustomUserViewSet, basename='users')
 
 
 urlpatterns = [
+    path('metrics', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
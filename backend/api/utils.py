@@ -1,7 +1,73 @@
+import string
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import Exists, OuterRef
+
+from recipes.models import LEGACY_SHORT_LINK_LENGTH
 from users.models import Subscription
 
 
+SHORT_LINK_ALPHABET = string.digits + string.ascii_letters
+SHORT_LINK_MAX_LENGTH = 11
+MAX_RECIPE_ID = 2 ** 63 - 1
+
+
 def is_subscribed(user, author):
     if user.is_anonymous:
         return False
+    if hasattr(author, 'is_subscribed'):
+        return author.is_subscribed
     return Subscription.objects.filter(user=user, author=author).exists()
+
+
+def annotate_is_subscribed(users, user):
+    return users.annotate(
+        is_subscribed=Exists(
+            Subscription.objects.filter(user=user, author=OuterRef('pk'))
+        )
+    )
+
+
+def encode_short_link(recipe_id):
+    base = len(SHORT_LINK_ALPHABET)
+    code = ''
+    while True:
+        recipe_id, remainder = divmod(recipe_id, base)
+        code = SHORT_LINK_ALPHABET[remainder] + code
+        if not recipe_id:
+            break
+    # Legacy codes own this length; a leading zero keeps the same id.
+    if len(code) == LEGACY_SHORT_LINK_LENGTH:
+        code = SHORT_LINK_ALPHABET[0] + code
+    return code
+
+
+def decode_short_link(code):
+    if (len(code) > SHORT_LINK_MAX_LENGTH
+            or len(code) == LEGACY_SHORT_LINK_LENGTH):
+        return None
+    base = len(SHORT_LINK_ALPHABET)
+    recipe_id = 0
+    for char in code:
+        index = SHORT_LINK_ALPHABET.find(char)
+        if index == -1:
+            return None
+        recipe_id = recipe_id * base + index
+    # Ids beyond a bigint column would fail in the database, not 404.
+    if recipe_id > MAX_RECIPE_ID:
+        return None
+    return recipe_id
+
+
+async def aiterate(iterable, chunk_size):
+    # Pulls a blocking iterator in chunks on the request's sync thread, so
+    # an ASGI worker serves other requests while a slow client downloads.
+    iterator = iter(iterable)
+    next_chunk = sync_to_async(lambda: list(islice(iterator, chunk_size)))
+    while True:
+        chunk = await next_chunk()
+        if not chunk:
+            return
+        for item in chunk:
+            yield item
@@ -1,51 +1,163 @@
-import csv
-import hashlib
-
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
 from django.urls import reverse
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import (
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Window,
+)
+from django.db.models.functions import RowNumber
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from djoser.views import UserViewSet
 
+from .caching import VersionedCacheMixin
 from .filters import IngredientFilter, RecipeFilter
+from .ingredient_index import get_ingredient_index
+from .metrics import registry
+from .pantry_index import get_pantry_index
 from .pagination import CustomPagination
-from .permissions import AdminOrAuthorOrReadOnly
+from .permissions import AdminOrAuthorOrReadOnly, AdminOrMetricsToken
+from .renderers import (
+    PrometheusRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+    ShoppingListTextRenderer,
+)
 from .serializers import (
+    RECIPE_BULK_MAX_SIZE,
     CreateRecipeSerializer,
     IngredientSerializer,
+    PantryRecipeSerializer,
     RecipeGetSerializer,
+    RecipeIdsSerializer,
     ShoppingCartRecipeSerializer,
     TagSerializer,
     CustomUserSerializer,
     SubscriptionSerializer,
 )
+from .utils import (
+    aiterate,
+    annotate_is_subscribed,
+    decode_short_link,
+    encode_short_link,
+)
 from recipes.models import (
+    LEGACY_SHORT_LINK_LENGTH,
     Favorite,
+    FeedEntry,
     Ingredient,
-    RecipeIngredient,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
+    ShortLink,
     Tag
 )
+from recipes.counters import change_counter, change_counters
+from recipes.versions import INGREDIENTS, RECIPES, TAGS
 from users.models import User, Subscription
 
 
+SHOPPING_LIST_CHUNK_SIZE = 2000
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def lock_recipes(model, user, recipe_ids):
+    # Requests of one user queue up here, so a double click can neither
+    # insert the same row twice nor count it twice.
+    User.objects.select_for_update().get(pk=user.pk)
+    found = set(
+        Recipe.objects.filter(id__in=recipe_ids).values_list(
+            'id', flat=True
+        )
+    )
+    present = set(
+        model.objects.filter(author=user, recipe__in=found).values_list(
+            'recipe', flat=True
+        )
+    )
+    return found, present
+
+
+def add_recipes(model, user, recipe_ids):
+    with transaction.atomic():
+        found, present = lock_recipes(model, user, recipe_ids)
+        added = found - present
+        model.objects.bulk_create(
+            [model(author=user, recipe_id=recipe_id) for recipe_id in added],
+            ignore_conflicts=True,
+        )
+        change_counters(Recipe, added, RECIPE_COUNTERS[model], 1)
+    return found, added
+
+
+def delete_recipes(model, user, recipe_ids):
+    with transaction.atomic():
+        found, present = lock_recipes(model, user, recipe_ids)
+        model.objects.filter(author=user, recipe__in=present).delete()
+        change_counters(Recipe, present, RECIPE_COUNTERS[model], -1)
+    return found, present
+
+
+def toggle_recipe(model, user, recipe_id, add):
+    with transaction.atomic():
+        if add:
+            _, changed = add_recipes(model, user, [recipe_id])
+        else:
+            _, changed = delete_recipes(model, user, [recipe_id])
+        if model is ShoppingCart and changed:
+            ShoppingListItem.objects.refresh(
+                [user], Ingredient.objects.filter(recipes=recipe_id)
+            )
+    return bool(changed)
+
+
 class CustomUserViewSet(UserViewSet):
 
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
+    cursor_ordering = 'id'
 
     def get_permissions(self):
         if self.action == 'me':
             return IsAuthenticated(),
         return super().get_permissions()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = annotate_is_subscribed(queryset, user)
+        return queryset
+
+    def get_subscriptions_queryset(self, authors):
+        recipes = Recipe.objects.all()
+        limit = self.request.query_params.get('recipes_limit')
+        if limit and limit.isdigit():
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author'),
+                    order_by=Recipe._meta.ordering,
+                )
+            ).filter(row_number__lte=int(limit))
+
+        return annotate_is_subscribed(
+            authors, self.request.user
+        ).prefetch_related(Prefetch('recipes', queryset=recipes))
+
     @action(
         detail=False,
         methods=['put', 'delete'],
@@ -54,14 +166,17 @@ class CustomUserViewSet(UserViewSet):
     )
     def update_avatar(self, request, *args, **kwargs):
         user = request.user
-        serializer = self.get_serializer(user)
 
         if request.method == 'PUT':
-            serializer.update(user, request.data)
+            serializer = self.get_serializer(
+                user, data=request.data, partial=True
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
             avatar_url = request.build_absolute_uri(user.avatar.url)
             return Response({'avatar': avatar_url}, status=status.HTTP_200_OK)
 
-        serializer.delete_avatar()
+        self.get_serializer(user).delete_avatar()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -73,8 +188,10 @@ class CustomUserViewSet(UserViewSet):
     def subscriptions(self, request):
         user = request.user
         subscribed_users = user.subscriptions.all()
-        users = User.objects.filter(
-            id__in=subscribed_users.values_list('author', flat=True)
+        users = self.get_subscriptions_queryset(
+            User.objects.filter(
+                id__in=subscribed_users.values_list('author', flat=True)
+            ).order_by('id')
         )
         page = self.paginate_queryset(users)
         serializer = SubscriptionSerializer(
@@ -97,78 +214,259 @@ class CustomUserViewSet(UserViewSet):
         if request.method == 'POST':
             if author == user:
                 return Response(status=status.HTTP_400_BAD_REQUEST)
-            if Subscription.objects.filter(
-                user=user,
-                author=author
-            ).exists():
+            if author.is_subscribed:
                 return Response(
                     {'detail': 'Вы уже подписаны на этого пользователя.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            Subscription.objects.create(user=user, author=author)
+            with transaction.atomic():
+                Subscription.objects.create(user=user, author=author)
+                change_counter(User, author.pk, 'subscribers_count', 1)
+                FeedEntry.objects.follow(user, author)
             serializer = SubscriptionSerializer(
-                author,
+                self.get_subscriptions_queryset(
+                    User.objects.filter(id=author.id)
+                ).get(),
                 context={'request': request}
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        try:
-            subscription = Subscription.objects.get(
+        with transaction.atomic():
+            deleted, _ = Subscription.objects.filter(
                 user=user,
                 author=author
-            )
-            subscription.delete()
+            ).delete()
+            if deleted:
+                change_counter(User, author.pk, 'subscribers_count', -1)
+                FeedEntry.objects.unfollow(user, author)
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
-        except Subscription.DoesNotExist:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(VersionedCacheMixin, viewsets.ReadOnlyModelViewSet):
 
+    cache_namespace = INGREDIENTS
+    cache_query_params = ('name',)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     search_fields = ['name']
 
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(self.search, request)
+
+    def search(self, request):
+        return Response(
+            get_ingredient_index().search(request.query_params['name'])
+        )
+
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(VersionedCacheMixin, viewsets.ReadOnlyModelViewSet):
 
+    cache_namespace = TAGS
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     filter_backends = (DjangoFilterBackend,)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(VersionedCacheMixin, viewsets.ModelViewSet):
 
     queryset = Recipe.objects.all()
+    cache_namespace = RECIPES
+    cache_anonymous_only = True
+    cache_query_params = (
+        'author',
+        'cursor',
+        'is_favorited',
+        'is_in_shopping_cart',
+        'limit',
+        'page',
+        'search',
+        'tags',
+    )
     pagination_class = CustomPagination
+    cursor_ordering = '-id'
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (AdminOrAuthorOrReadOnly,)
 
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Recipe.objects.prefetch_related(
+            'tags',
+            'recipe_ingredients__ingredient',
+        )
+        if not user.is_authenticated:
+            return queryset.select_related('author')
+
+        return queryset.prefetch_related(
+            Prefetch(
+                'author',
+                queryset=annotate_is_subscribed(User.objects.all(), user)
+            )
+        ).annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(author=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(
+                    author=user,
+                    recipe=OuterRef('pk')
+                )
+            ),
+        )
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeGetSerializer
         return CreateRecipeSerializer
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            serializer.save(author=self.request.user)
+            change_counter(User, self.request.user.pk, 'recipes_count', 1)
+
+    def perform_destroy(self, instance):
+        authors = list(User.objects.filter(shopping_cart__recipe=instance))
+        ingredients = list(instance.ingredients.all())
+        with transaction.atomic():
+            instance.delete()
+            change_counter(User, instance.author_id, 'recipes_count', -1)
+            ShoppingListItem.objects.refresh(authors, ingredients)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        methods=('post',),
+        url_path='bulk'
+    )
+    def bulk(self, request):
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=RECIPE_BULK_MAX_SIZE
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            recipes = serializer.save(author=request.user)
+            change_counter(
+                User, request.user.pk, 'recipes_count', len(recipes)
+            )
+        recipes = self.get_queryset().filter(
+            id__in=[recipe.id for recipe in recipes]
+        )
+        serializer = RecipeGetSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path='feed'
+    )
+    def feed(self, request):
+        queryset = self.filter_queryset(
+            FeedEntry.objects.filter_feed(self.get_queryset(), request.user)
+        ).order_by('-id')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=True,
+        url_path='similar'
+    )
+    def similar(self, request, pk):
+        recipe = get_object_or_404(Recipe, id=pk)
+        queryset = self.get_queryset().filter(
+            neighbour_of__recipe=recipe
+        ).order_by('-neighbour_of__score', '-id')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        url_path='pantry'
+    )
+    def pantry(self, request):
+        try:
+            pantry = {
+                int(ingredient)
+                for ingredient in request.query_params.getlist('ingredients')
+            }
+            max_missing = int(request.query_params.get('missing', 0))
+        except ValueError:
+            pantry, max_missing = None, -1
+        if not pantry or max_missing < 0:
+            return Response(
+                {'detail': 'Укажите id ингредиентов и число missing >= 0.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        matches = get_pantry_index().search(pantry, max_missing)
+        page = self.paginate_queryset(matches)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in page]
+        )
+        found = []
+        for recipe_id, missing in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.missing = missing
+                found.append(recipe)
+        serializer = PantryRecipeSerializer(
+            found, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    def change_recipes(self, model, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        author = request.user
+        with transaction.atomic():
+            if request.method == 'POST':
+                found, changed = add_recipes(model, author, recipe_ids)
+                done, skipped = 'added', 'already_added'
+            else:
+                found, changed = delete_recipes(
+                    model, author, recipe_ids
+                )
+                done, skipped = 'deleted', 'not_added'
+            if model is ShoppingCart and changed:
+                ShoppingListItem.objects.refresh(
+                    [author], Ingredient.objects.filter(recipes__in=changed)
+                )
+
+        return Response([
+            {
+                'id': recipe_id,
+                'status': (
+                    done if recipe_id in changed
+                    else skipped if recipe_id in found
+                    else 'not_found'
+                ),
+            }
+            for recipe_id in recipe_ids
+        ])
 
     def add_recipe(self, model, user, pk):
         recipe = get_object_or_404(Recipe, id=pk)
-        if model.objects.filter(recipe=recipe, author=user).exists():
+        if not toggle_recipe(model, user, recipe.id, add=True):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        model.objects.create(recipe=recipe, author=user)
         serializer = ShoppingCartRecipeSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete_recipe(self, model, user, pk):
         recipe = get_object_or_404(Recipe, id=pk)
-        obj = model.objects.filter(recipe=recipe, author=user).first()
-        if obj:
-            obj.delete()
+        if toggle_recipe(model, user, recipe.id, add=False):
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
@@ -185,36 +483,50 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.delete_recipe(ShoppingCart, author, pk)
 
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        methods=('post', 'delete'),
+        url_path='shopping_cart'
+    )
+    def bulk_shopping_cart(self, request):
+        return self.change_recipes(ShoppingCart, request)
+
     @action(
         detail=False,
         permission_classes=(IsAuthenticated,),
         methods=['get'],
-        url_path='download_shopping_cart'
+        url_path='download_shopping_cart',
+        renderer_classes=(
+            ShoppingListCSVRenderer,
+            ShoppingListTextRenderer,
+            ShoppingListJSONRenderer,
+        )
     )
     def download_shopping_cart(self, request):
         user = request.user
 
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__author=user
-        ).values('ingredient__name', 'ingredient__measurement_unit').annotate(
-            ingredients_amount=Sum('amount')
+        rows = ShoppingListItem.objects.filter(
+            author=user
+        ).values_list(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'total_amount'
+        ).order_by(
+            'ingredient__name', 'ingredient'
+        ).iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+        renderer = request.accepted_renderer
+        content = renderer.stream(rows)
+        if isinstance(request._request, ASGIRequest):
+            # Under ASGI a sync iterator would be read into memory first.
+            content = aiterate(content, SHOPPING_LIST_CHUNK_SIZE)
+        response = StreamingHttpResponse(
+            content,
+            content_type=f'{renderer.media_type}; charset=utf-8'
         )
-
-        response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.csv"'
+            f'attachment; filename="shopping_cart.{renderer.format}"'
         )
-        writer = csv.writer(response)
-        writer.writerow(['Ingredient', 'Amount'])
-
-        for ingredient in ingredients:
-            writer.writerow([
-                ingredient['ingredient__name'],
-                ingredient['ingredient__measurement_unit'],
-                ingredient['ingredients_amount']
-            ]
-            )
-
         return response
 
     @action(
@@ -225,9 +537,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_link(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
 
-        short_link_code = hashlib.md5(str(recipe.id).encode()).hexdigest()[:6]
         short_link = request.build_absolute_uri(
-            reverse('short_link', kwargs={'pk': short_link_code})
+            reverse(
+                'short_link',
+                kwargs={'code': encode_short_link(recipe.id)}
+            )
         )
 
         return Response({'short-link': short_link}, status=status.HTTP_200_OK)
@@ -245,13 +559,39 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.delete_recipe(Favorite, author, pk)
 
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        methods=('post', 'delete'),
+        url_path='favorite'
+    )
+    def bulk_favorite(self, request):
+        return self.change_recipes(Favorite, request)
+
+
+class MetricsView(APIView):
 
-def short_link(request, pk):
-    recipes = Recipe.objects.all()
+    permission_classes = (AdminOrMetricsToken,)
+    renderer_classes = (PrometheusRenderer,)
+
+    def get(self, request):
+        return Response(
+            sorted(registry.collect().items()),
+            content_type=PrometheusRenderer.content_type
+        )
 
-    for recipe in recipes:
-        id_recipe = hashlib.md5(str(recipe.id).encode()).hexdigest()[:6]
-        if id_recipe == pk:
-            return redirect(f'/recipes/{recipe.id}/')
 
-    return print(f'Не существует {recipe.id}')
+def short_link(request, code):
+    if len(code) == LEGACY_SHORT_LINK_LENGTH:
+        recipe_id = ShortLink.objects.filter(code=code).values_list(
+            'recipe_id', flat=True
+        ).first()
+    else:
+        recipe_id = decode_short_link(code)
+        if (recipe_id is not None
+                and not Recipe.objects.filter(id=recipe_id).exists()):
+            recipe_id = None
+    if recipe_id is None:
+        raise Http404(f'Не существует рецепта по ссылке {code}')
+
+    return redirect(f'/recipes/{recipe_id}/')
@@ -0,0 +1,15 @@
+from django.urls import path
+
+from api import async_views
+from .urls import urlpatterns as wsgi_urlpatterns
+
+
+# Served by foodgram.asgi only: these paths go to native async views, the
+# rest is shared with the WSGI deployment, where a thread hop per request
+# would only cost time.
+urlpatterns = [
+    path('api/recipes/<int:pk>/favorite/', async_views.favorite),
+    path('api/recipes/<int:pk>/shopping_cart/', async_views.shopping_cart),
+    path('api/users/me/avatar/', async_views.avatar),
+    path('s/<str:code>/', async_views.short_link, name='short_link'),
+] + wsgi_urlpatterns
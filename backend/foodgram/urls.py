@@ -9,5 +9,5 @@ from api.views import short_link
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls', namespace='api')),
-    path('s/<str:pk>/', short_link, name='short_link'),
+    path('s/<str:code>/', short_link, name='short_link'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
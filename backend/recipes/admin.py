@@ -5,6 +5,7 @@ from .models import (
     Ingredient,
     Recipe,
     ShoppingCart,
+    ShortLink,
     Tag,
 )
 from users.models import User
@@ -16,3 +17,4 @@ admin.site.register(Ingredient)
 admin.site.register(Tag)
 admin.site.register(Favorite)
 admin.site.register(ShoppingCart)
+admin.site.register(ShortLink)
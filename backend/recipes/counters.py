@@ -0,0 +1,48 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Subscription, User
+from .models import Favorite, Recipe, ShoppingCart
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+)
+
+
+def change_counter(model, pk, counter, delta):
+    change_counters(model, [pk], counter, delta)
+
+
+def change_counters(model, pks, counter, delta):
+    model.objects.filter(pk__in=pks).update(
+        **{counter: Greatest(F(counter) + delta, 0)}
+    )
+
+
+def count_of(related, field):
+    return Coalesce(
+        Subquery(
+            related.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def recount(counters=COUNTERS):
+    fixed = {}
+    for model, counter, related, field in counters:
+        drifted = model.objects.annotate(
+            actual=count_of(related, field)
+        ).exclude(**{counter: F('actual')}).values('pk')
+        fixed[counter] = model.objects.filter(pk__in=drifted).update(
+            **{counter: count_of(related, field)}
+        )
+    return fixed
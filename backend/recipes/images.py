@@ -0,0 +1,96 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+from PIL import Image, ImageOps
+
+
+MAX_IMAGE_SIDE = 6000
+MIN_IMAGE_SIDE = 32
+ORIGINAL_MAX_SIDE = 2048
+VARIANTS = {
+    'thumbnail': 320,
+    'medium': 960,
+}
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def open_image(content):
+    content.seek(0)
+    image = Image.open(content)
+    image = ImageOps.exif_transpose(image)
+    if has_alpha(image):
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def encode_image(image, format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format=format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def reencode_original(content):
+    image = open_image(content)
+    image.thumbnail((ORIGINAL_MAX_SIDE, ORIGINAL_MAX_SIDE))
+    if image.mode == 'RGBA':
+        return encode_image(image, 'PNG', optimize=True), '.png'
+    return encode_image(
+        image, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True
+    ), '.jpg'
+
+
+def variant_name(name, variant):
+    root, _ = os.path.splitext(name)
+    return f'{root}_{variant}.webp'
+
+
+class VariantImageFieldFile(ImageFieldFile):
+
+    def save(self, name, content, save=True):
+        content, ext = reencode_original(content)
+        name = os.path.splitext(name)[0] + ext
+        super().save(name, content, save=False)
+        self.save_variants()
+        if save:
+            self.instance.save()
+
+    def save_variants(self):
+        with self.open('rb') as file:
+            image = open_image(file)
+        for variant, side in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((side, side))
+            name = variant_name(self.name, variant)
+            if self.storage.exists(name):
+                self.storage.delete(name)
+            self.storage.save(
+                name, encode_image(resized, 'WEBP', quality=WEBP_QUALITY)
+            )
+
+    def delete(self, save=True):
+        if self:
+            for variant in VARIANTS:
+                self.storage.delete(variant_name(self.name, variant))
+        super().delete(save=save)
+
+    @property
+    def variants(self):
+        return {
+            variant: self.storage.url(variant_name(self.name, variant))
+            for variant in VARIANTS
+        }
+
+
+class VariantImageField(models.ImageField):
+
+    attr_class = VariantImageFieldFile
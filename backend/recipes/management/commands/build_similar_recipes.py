@@ -0,0 +1,72 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import (
+    BLOCK_SIZE,
+    MAX_BLOCK_PAIRS,
+    TOP_K,
+    rebuild_neighbours,
+)
+
+
+class Command(BaseCommand):
+
+    help = 'Пересчитывает похожие рецепты по пересечению ингредиентов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Пересчитать только рецепты с изменёнными ингредиентами.',
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=TOP_K,
+            help='Сколько похожих рецептов хранить для каждого рецепта.',
+        )
+        parser.add_argument(
+            '--block-size',
+            type=int,
+            default=BLOCK_SIZE,
+            help='Сколько рецептов обрабатывать и сохранять за раз.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Сколько процессов использовать.',
+        )
+        parser.add_argument(
+            '--max-pairs',
+            type=int,
+            default=MAX_BLOCK_PAIRS,
+            help=(
+                'Сколько пар рецептов сравнивать за раз на процесс; '
+                'ограничивает память.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(done, total):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'Рецепты: {done}/{total}, '
+                f'{done / elapsed if elapsed else done:.0f} рецептов/с'
+            )
+
+        done = rebuild_neighbours(
+            incremental=options['incremental'],
+            top_k=options['top_k'],
+            block_size=options['block_size'],
+            workers=options['workers'],
+            max_pairs=options['max_pairs'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие рецепты пересчитаны для {done} рецептов.'
+        ))
@@ -0,0 +1,320 @@
+import random
+import time
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from recipes.models import (
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    Recipe,
+    RecipeChange,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag
+)
+from recipes.search import index_recipes
+from recipes.versions import RECIPES, TAGS, bump_version
+from users.models import Subscription, User
+
+
+DEFAULT_INGREDIENTS = settings.BASE_DIR.parent / 'data' / 'ingredients.json'
+PASSWORD = 'synthetic-password'
+TAG_CHOICES = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+    ('Десерт', 'dessert'),
+    ('Выпечка', 'bakery'),
+    ('Вегетарианское', 'vegetarian'),
+)
+DISHES = (
+    'суп', 'салат', 'пирог', 'рагу', 'омлет', 'каша', 'паста', 'запеканка',
+    'плов', 'борщ', 'оладьи', 'котлеты', 'жаркое', 'ризотто', 'кекс',
+)
+ADJECTIVES = (
+    'домашний', 'быстрый', 'летний', 'пряный', 'бабушкин', 'лёгкий',
+    'сытный', 'праздничный', 'острый', 'нежный', 'деревенский', 'весенний',
+)
+WORDS = (
+    'нарежьте', 'смешайте', 'обжарьте', 'добавьте', 'посолите', 'варите',
+    'запекайте', 'остудите', 'подавайте', 'перемешайте', 'минут', 'до',
+    'готовности', 'на', 'среднем', 'огне', 'с', 'зеленью', 'и', 'соусом',
+)
+
+
+class ZipfSampler:
+
+    def __init__(self, population, exponent, rng):
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent
+            for rank in range(1, len(self.population) + 1)
+        ))
+        self.rng = rng
+
+    def choice(self):
+        return self.choices(1)[0]
+
+    def choices(self, k):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights, k=k
+        )
+
+    def sample(self, k, exclude=None):
+        k = min(k, len(self.population) - (exclude is not None))
+        picked = set()
+        # Popular items keep coming up again, so give up after a while
+        # instead of looping until the long tail is reached.
+        for _ in range(10):
+            if len(picked) >= k:
+                break
+            picked.update(self.choices(k - len(picked)))
+            picked.discard(exclude)
+        return picked
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Заполняет базу синтетическими пользователями, рецептами, '
+        'избранным, корзинами и подписками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Сколько пользователей создать.',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=10000,
+            help='Сколько рецептов создать.',
+        )
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=20,
+            help='Сколько рецептов в избранном у пользователя в среднем.',
+        )
+        parser.add_argument(
+            '--carts',
+            type=int,
+            default=3,
+            help='Сколько рецептов в корзине у пользователя в среднем.',
+        )
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=10,
+            help='На сколько авторов подписан пользователь в среднем.',
+        )
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Показатель распределения Ципфа для популярности.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно генератора; одинаковое зерно даёт одинаковые данные.',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='synthetic',
+            help='Префикс имён и почт создаваемых пользователей.',
+        )
+        parser.add_argument(
+            '--ingredients',
+            default=DEFAULT_INGREDIENTS,
+            help='Справочник ингредиентов для load_ingredients.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Сколько строк вставлять за одну транзакцию.',
+        )
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже есть, '
+                'укажите другой --prefix.'
+            )
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь и рецепт.')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.zipf = options['zipf']
+
+        call_command(
+            'load_ingredients', options['ingredients'], stdout=self.stdout
+        )
+        ingredients = ZipfSampler(
+            Ingredient.objects.order_by('id').values_list('id', flat=True),
+            self.zipf,
+            self.rng
+        )
+        if not ingredients.population:
+            raise CommandError('Справочник ингредиентов пуст.')
+        tag_ids = self.create_tags()
+
+        user_ids = self.create_users(prefix, options['users'])
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, tag_ids, ingredients
+        )
+
+        recipes = ZipfSampler(recipe_ids, self.zipf, self.rng)
+        for model, average in (
+            (Favorite, options['favorites']),
+            (ShoppingCart, options['carts']),
+        ):
+            self.insert_rows(model, str(model._meta.verbose_name_plural), (
+                model(author_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in recipes.sample(self.count(average))
+            ))
+
+        authors = ZipfSampler(user_ids, self.zipf, self.rng)
+        self.insert_rows(Subscription, 'Подписки', (
+            Subscription(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in authors.sample(
+                self.count(options['follows']), exclude=user_id
+            )
+        ))
+
+        call_command('recount', stdout=self.stdout)
+        started = time.perf_counter()
+        for start in range(0, len(user_ids), self.batch_size):
+            FeedEntry.objects.rebuild(user_ids[start:start + self.batch_size])
+            self.report(
+                'Ленты', min(start + self.batch_size, len(user_ids)),
+                len(user_ids), started
+            )
+        call_command('rebuild_shopping_lists', stdout=self.stdout)
+        bump_version(RECIPES)
+        RecipeChange.objects.reset()
+        self.stdout.write(self.style.SUCCESS('Данные сгенерированы.'))
+
+    def count(self, average):
+        return self.rng.randint(0, 2 * average)
+
+    def create_tags(self):
+        for name, slug in TAG_CHOICES:
+            Tag.objects.get_or_create(slug=slug, defaults={'name': name})
+        bump_version(TAGS)
+        return list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+    def create_users(self, prefix, total):
+        password = make_password(PASSWORD)
+        self.insert_rows(User, 'Пользователи', (
+            User(
+                username=f'{prefix}-{number}',
+                email=f'{prefix}-{number}@example.com',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            )
+            for number in range(total)
+        ))
+        return list(
+            User.objects.filter(
+                username__startswith=f'{prefix}-'
+            ).order_by('id').values_list('id', flat=True)
+        )
+
+    def create_placeholder_image(self):
+        buffer = BytesIO()
+        Image.new('RGB', (640, 480), (230, 180, 120)).save(buffer, 'JPEG')
+        recipe = Recipe()
+        recipe.image.save(
+            'synthetic.jpg', ContentFile(buffer.getvalue()), save=False
+        )
+        return recipe.image.name
+
+    def create_recipes(self, total, user_ids, tag_ids, ingredients):
+        image = self.create_placeholder_image()
+        authors = ZipfSampler(user_ids, self.zipf, self.rng)
+        rng = self.rng
+        started = time.perf_counter()
+        recipe_ids = []
+        for start in range(0, total, self.batch_size):
+            recipes = [
+                Recipe(
+                    author_id=authors.choice(),
+                    name=(
+                        f'{rng.choice(ADJECTIVES).capitalize()} '
+                        f'{rng.choice(DISHES)} №{number}'
+                    ),
+                    text=' '.join(rng.choices(WORDS, k=rng.randint(5, 40))),
+                    cooking_time=rng.randint(5, 180),
+                    image=image,
+                )
+                for number in range(start, min(start + self.batch_size, total))
+            ]
+            with transaction.atomic():
+                Recipe.objects.bulk_create(recipes)
+                Recipe.tags.through.objects.bulk_create(
+                    Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+                    for recipe in recipes
+                    for tag_id in rng.sample(tag_ids, rng.randint(1, 3))
+                )
+                RecipeIngredient.objects.bulk_create(
+                    RecipeIngredient(
+                        recipe_id=recipe.id,
+                        ingredient_id=ingredient_id,
+                        amount=rng.randint(1, 500),
+                    )
+                    for recipe in recipes
+                    for ingredient_id in ingredients.sample(
+                        rng.randint(3, 10)
+                    )
+                )
+                index_recipes(recipes)
+            recipe_ids.extend(recipe.id for recipe in recipes)
+            self.report('Рецепты', len(recipe_ids), total, started)
+        return recipe_ids
+
+    def insert_rows(self, model, title, rows):
+        started = time.perf_counter()
+        created = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                created += self.insert(model, batch)
+                self.report(title, created, None, started)
+                batch = []
+        created += self.insert(model, batch)
+        self.report(title, created, created, started)
+
+    def insert(self, model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        return len(batch)
+
+    def report(self, title, done, total, started):
+        elapsed = time.perf_counter() - started
+        progress = f'{done}/{total}' if total is not None else f'{done}'
+        self.stdout.write(
+            f'{title}: {progress}, '
+            f'{done / elapsed if elapsed else done:.0f} строк/с'
+        )
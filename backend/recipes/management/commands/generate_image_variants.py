@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import VARIANTS, variant_name
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+
+    help = 'Создаёт уменьшенные WebP-копии для загруженных изображений.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать копии, даже если они уже есть.',
+        )
+
+    def handle(self, *args, **options):
+        created = 0
+        for model, field in ((Recipe, 'image'), (User, 'avatar')):
+            instances = model.objects.exclude(
+                **{f'{field}__in': ('', None)}
+            ).only('pk', field)
+            for instance in instances.iterator():
+                image = getattr(instance, field)
+                missing = not all(
+                    image.storage.exists(variant_name(image.name, variant))
+                    for variant in VARIANTS
+                )
+                if not (missing or options['force']):
+                    continue
+                try:
+                    image.save_variants()
+                except (OSError, ValueError) as error:
+                    self.stderr.write(f'{image.name}: {error}')
+                    continue
+                created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено изображений: {created}.'
+        ))
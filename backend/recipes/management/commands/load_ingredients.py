@@ -0,0 +1,106 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import Ingredient
+from recipes.versions import INGREDIENTS, bump_version
+
+
+DEFAULT_PATH = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    while True:
+        chunk = file.read(READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in '[,] \t\r\n':
+                position += 1
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            position = end
+            yield item['name'], item['measurement_unit']
+        if not chunk:
+            if buffer[position:].strip():
+                raise CommandError('Файл JSON обрезан или повреждён.')
+            return
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+class Command(BaseCommand):
+
+    help = 'Загружает справочник ингредиентов из CSV или JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=DEFAULT_PATH,
+            type=Path,
+            help='Путь к ingredients.csv или ingredients.json.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк вставлять одним запросом.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError(f'Неизвестный формат файла: {path.name}')
+        if not path.exists():
+            raise CommandError(f'Файл не найден: {path}')
+
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+        before = Ingredient.objects.count()
+        rows = 0
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            batch = []
+            for name, measurement_unit in reader(file):
+                batch.append(Ingredient(
+                    name=name.strip(),
+                    measurement_unit=measurement_unit.strip(),
+                ))
+                if len(batch) >= batch_size:
+                    rows += self.insert(batch)
+                    batch = []
+            rows += self.insert(batch)
+            transaction.on_commit(lambda: bump_version(INGREDIENTS))
+
+        elapsed = time.perf_counter() - started
+        created = Ingredient.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {rows}, добавлено: {created}, '
+            f'{rows / elapsed if elapsed else rows:.0f} строк/с.'
+        ))
+
+    def insert(self, batch):
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        return len(batch)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import FeedEntry
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+
+    help = 'Пересобирает ленты подписок из подписок и рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько пользователей пересобирать за один проход.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = sorted(
+            set(Subscription.objects.values_list('user', flat=True))
+            | set(FeedEntry.objects.values_list('user', flat=True))
+        )
+        for start in range(0, len(user_ids), batch_size):
+            FeedEntry.objects.rebuild(user_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {len(user_ids)}.'
+        ))
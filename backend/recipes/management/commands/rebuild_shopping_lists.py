@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+
+class Command(BaseCommand):
+
+    help = 'Сверяет списки покупок с корзинами и пересобирает расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только найти расхождения, ничего не исправляя.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько пользователей сверять за один проход.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        author_ids = sorted(
+            set(ShoppingCart.objects.values_list('author', flat=True))
+            | set(ShoppingListItem.objects.values_list('author', flat=True))
+        )
+
+        drifted = 0
+        for start in range(0, len(author_ids), batch_size):
+            batch = author_ids[start:start + batch_size]
+            expected = RecipeIngredient.objects.filter(
+                recipe__shopping_cart__author__in=batch
+            ).values(
+                'recipe__shopping_cart__author', 'ingredient'
+            ).annotate(
+                total_amount=Sum('amount')
+            ).values_list(
+                'recipe__shopping_cart__author', 'ingredient', 'total_amount'
+            ).order_by()
+            actual = ShoppingListItem.objects.filter(
+                author__in=batch
+            ).values_list('author', 'ingredient', 'total_amount')
+
+            authors = {
+                author_id
+                for author_id, _, _ in set(expected) ^ set(actual)
+            }
+            drifted += len(authors)
+            if authors and not options['check']:
+                ShoppingListItem.objects.refresh(authors)
+
+        if options['check'] and drifted:
+            raise CommandError(
+                f'Списки покупок расходятся у {drifted} пользователей.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено пользователей: {len(author_ids)}, '
+            f'пересобрано: {0 if options["check"] else drifted}.'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount
+from recipes.versions import RECIPES, bump_version
+
+
+class Command(BaseCommand):
+
+    help = 'Пересчитывает счётчики избранного, корзин, рецептов и подписчиков.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = recount()
+        if any(fixed.values()):
+            bump_version(RECIPES)
+        for counter, total in fixed.items():
+            self.stdout.write(f'{counter}: исправлено {total}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.14 on 2026-10-17 04:22
+
+import hashlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+LEGACY_CODE_LENGTH = 6
+BATCH_SIZE = 1000
+
+
+def backfill_legacy_short_links(apps, schema_editor):
+    # Old links were md5(id)[:6] resolved by scanning recipes in name order,
+    # so on a prefix collision the first recipe by name wins.
+    Recipe = apps.get_model('recipes', 'Recipe')
+    ShortLink = apps.get_model('recipes', 'ShortLink')
+    seen = set()
+    batch = []
+    recipe_ids = Recipe.objects.order_by('name', 'id').values_list(
+        'id', flat=True
+    )
+    for recipe_id in recipe_ids.iterator(chunk_size=BATCH_SIZE):
+        code = hashlib.md5(
+            str(recipe_id).encode()
+        ).hexdigest()[:LEGACY_CODE_LENGTH]
+        if code in seen:
+            continue
+        seen.add(code)
+        batch.append(ShortLink(code=code, recipe_id=recipe_id))
+        if len(batch) >= BATCH_SIZE:
+            ShortLink.objects.bulk_create(batch)
+            batch = []
+    ShortLink.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('name',), 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.CreateModel(
+            name='ShortLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=6, unique=True, verbose_name='Код')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='short_links', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Короткая ссылка',
+                'verbose_name_plural': 'Короткие ссылки',
+            },
+        ),
+        migrations.RunPython(
+            backfill_legacy_short_links, migrations.RunPython.noop
+        ),
+    ]
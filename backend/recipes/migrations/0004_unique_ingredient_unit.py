@@ -0,0 +1,68 @@
+# Generated by Django 4.2.14 on 2026-10-17 04:27
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+# The model validator limit at the time of this migration.
+MAX_AMOUNT = 999
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        keep = duplicate['keep']
+        others = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(id=keep)
+        for model, owner, amount, limit in (
+            (RecipeIngredient, 'recipe_id', 'amount', MAX_AMOUNT),
+            # Shopping list totals add up several recipes and have no limit.
+            (ShoppingListItem, 'author_id', 'total_amount', None),
+        ):
+            for row in model.objects.filter(ingredient__in=others):
+                kept = model.objects.filter(
+                    ingredient_id=keep, **{owner: getattr(row, owner)}
+                ).first()
+                if kept is None:
+                    row.ingredient_id = keep
+                    row.save()
+                    continue
+                total = getattr(kept, amount) + getattr(row, amount)
+                if limit is not None:
+                    total = min(total, limit)
+                setattr(kept, amount, total)
+                kept.save()
+                row.delete()
+        others.delete()
+    if schema_editor.connection.vendor == 'postgresql':
+        # Fire the deferred foreign key checks now: PostgreSQL refuses to
+        # alter a table with pending trigger events in the same
+        # transaction.
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        schema_editor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shopping_list_item'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_unit'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.14 on 2026-10-17 04:30
+
+from django.db import migrations
+import recipes.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_unique_ingredient_unit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=recipes.images.VariantImageField(upload_to='recipes/'),
+        ),
+    ]
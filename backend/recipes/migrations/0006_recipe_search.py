@@ -0,0 +1,53 @@
+# Generated by Django 4.2.14 on 2026-10-17 04:36
+
+from django.db import migrations
+
+
+# The expression must stay identical to what recipes.search.search_vector()
+# compiles to, or PostgreSQL will not use the index.
+POSTGRESQL_FORWARD = (
+    'CREATE INDEX "recipe_search_idx" ON "recipes_recipe" USING gin '
+    "((to_tsvector('russian'::regconfig, "
+    "COALESCE(\"name\", '') || ' ' || COALESCE(\"text\", ''))))",
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS "recipe_search_idx"',
+)
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5(name, text)',
+    'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+    'SELECT id, name, text FROM recipes_recipe',
+)
+SQLITE_BACKWARD = (
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    run(schema_editor, {
+        'postgresql': POSTGRESQL_FORWARD,
+        'sqlite': SQLITE_FORWARD,
+    })
+
+
+def drop_search_index(apps, schema_editor):
+    run(schema_editor, {
+        'postgresql': POSTGRESQL_BACKWARD,
+        'sqlite': SQLITE_BACKWARD,
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.14 on 2026-10-17 04:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_feed_entries(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    rows = Recipe.objects.filter(
+        author__subscribers__isnull=False,
+        author__subscribers_count__lt=settings.FEED_FANOUT_THRESHOLD,
+    ).values_list('author__subscribers__user', 'id').order_by()
+    batch = []
+    for user_id, recipe_id in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(FeedEntry(user_id=user_id, recipe_id=recipe_id))
+        if len(batch) >= BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch)
+            batch = []
+    FeedEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0007_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feedentry'),
+        ),
+        migrations.RunPython(backfill_feed_entries, migrations.RunPython.noop),
+    ]
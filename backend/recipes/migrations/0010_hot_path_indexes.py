@@ -0,0 +1,50 @@
+# Generated by Django 4.2.14 on 2026-10-17 04:56
+
+from django.db import migrations, models
+
+# INCLUDE and operator classes are PostgreSQL-only, so these indexes stay
+# out of the model state. UPPER("name") matches what name__istartswith
+# compiles to; upper() returns text, hence text_pattern_ops.
+POSTGRESQL_FORWARD = (
+    'CREATE INDEX "ingredient_name_upper_idx" ON "recipes_ingredient" '
+    '((UPPER("name")) text_pattern_ops)',
+    'CREATE INDEX "recipeingredient_cover_idx" ON "recipes_recipeingredient" '
+    '("recipe_id", "ingredient_id") INCLUDE ("amount")',
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS "ingredient_name_upper_idx"',
+    'DROP INDEX IF EXISTS "recipeingredient_cover_idx"',
+)
+
+
+def create_postgresql_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRESQL_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_postgresql_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRESQL_BACKWARD:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_neighbours'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['author', 'recipe'], name='favorite_author_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['author', 'recipe'], name='shoppingcart_author_recipe_idx'),
+        ),
+        migrations.RunPython(
+            create_postgresql_indexes, drop_postgresql_indexes
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.14 on 2026-10-17 05:11
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    RecipeChangeCounter = apps.get_model('recipes', 'RecipeChangeCounter')
+    RecipeChangeCounter.objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveBigIntegerField(db_index=True, verbose_name='Номер')),
+                ('recipe_id', models.PositiveBigIntegerField(verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Изменение рецепта',
+                'verbose_name_plural': 'Изменения рецептов',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeChangeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='Последний номер')),
+            ],
+            options={
+                'verbose_name': 'Счётчик изменений рецептов',
+                'verbose_name_plural': 'Счётчики изменений рецептов',
+            },
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
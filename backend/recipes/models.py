@@ -1,8 +1,17 @@
-from django.db import models
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Q, Sum
 from django.db.models.constraints import UniqueConstraint
 from django.core.validators import MaxValueValidator, MinValueValidator
 
-from users.models import User
+from users.models import Subscription, User
+from .images import VariantImageField
+
+
+LEGACY_SHORT_LINK_LENGTH = 6
+MAX_RECIPE_CHANGES = 1000
 
 
 class Tag(models.Model):
@@ -39,6 +48,12 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_unit'
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -57,7 +72,7 @@ class Recipe(models.Model):
         max_length=200,
         db_index=True,
     )
-    image = models.ImageField(
+    image = VariantImageField(
         upload_to='recipes/'
     )
     text = models.TextField(
@@ -79,16 +94,60 @@ class Recipe(models.Model):
         'Время приготовления',
         validators=[MinValueValidator(1), MaxValueValidator(999)]
     )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False,
+    )
+    neighbours_stale = models.BooleanField(
+        'Похожие рецепты устарели',
+        default=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('name',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=('id',),
+                condition=Q(neighbours_stale=True),
+                name='recipe_neighbours_stale_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
 
+class ShortLink(models.Model):
+
+    code = models.CharField(
+        'Код',
+        max_length=LEGACY_SHORT_LINK_LENGTH,
+        unique=True,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='short_links',
+        verbose_name='Рецепт',
+    )
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+
+    def __str__(self):
+        return self.code
+
+
 class RecipeIngredient(models.Model):
 
     recipe = models.ForeignKey(
@@ -111,6 +170,8 @@ class RecipeIngredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент рецепта'
         verbose_name_plural = 'Ингредиенты рецепта'
+        # PostgreSQL also gets a covering (recipe, ingredient) INCLUDE
+        # (amount) index from 0010_hot_path_indexes.
         constraints = [
             UniqueConstraint(
                 fields=('recipe', 'ingredient'),
@@ -145,11 +206,86 @@ class ShoppingCart(models.Model):
                 name='unique_shoppingcart'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('author', 'recipe'),
+                name='shoppingcart_author_recipe_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe.name}'
 
 
+class ShoppingListItemManager(models.Manager):
+
+    def refresh(self, authors, ingredients=None):
+        totals = RecipeIngredient.objects.filter(
+            recipe__shopping_cart__author__in=authors
+        )
+        items = self.filter(author__in=authors)
+        if ingredients is not None:
+            totals = totals.filter(ingredient__in=ingredients)
+            items = items.filter(ingredient__in=ingredients)
+        totals = totals.values(
+            'recipe__shopping_cart__author', 'ingredient'
+        ).annotate(total_amount=Sum('amount')).order_by()
+
+        with transaction.atomic():
+            fresh = self.bulk_create(
+                [
+                    self.model(
+                        author_id=total['recipe__shopping_cart__author'],
+                        ingredient_id=total['ingredient'],
+                        total_amount=total['total_amount'],
+                    )
+                    for total in totals
+                ],
+                update_conflicts=True,
+                unique_fields=('author', 'ingredient'),
+                update_fields=('total_amount',),
+            )
+            keys = {(item.author_id, item.ingredient_id) for item in fresh}
+            stale = [
+                pk for pk, author_id, ingredient_id in items.values_list(
+                    'pk', 'author_id', 'ingredient_id'
+                )
+                if (author_id, ingredient_id) not in keys
+            ]
+            self.filter(pk__in=stale).delete()
+
+
+class ShoppingListItem(models.Model):
+
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=('author', 'ingredient'),
+                name='unique_shoppinglistitem'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient.name}'
+
+
 class Favorite(models.Model):
 
     author = models.ForeignKey(
@@ -173,6 +309,221 @@ class Favorite(models.Model):
                 name='unique_favorite'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('author', 'recipe'),
+                name='favorite_author_recipe_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe.name}'
+
+
+class FeedEntryManager(models.Manager):
+
+    def popular_authors(self):
+        return User.objects.filter(
+            subscribers_count__gte=settings.FEED_FANOUT_THRESHOLD
+        )
+
+    def fan_out(self, recipes):
+        recipe_ids = defaultdict(list)
+        for recipe in recipes:
+            recipe_ids[recipe.author_id].append(recipe.id)
+        # Only the posting authors' counters are checked, by primary key.
+        authors = User.objects.filter(
+            pk__in=recipe_ids,
+            subscribers_count__lt=settings.FEED_FANOUT_THRESHOLD
+        ).values_list('pk', flat=True)
+        subscriptions = Subscription.objects.filter(
+            author__in=list(authors)
+        ).values_list('user', 'author')
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, recipe_id=recipe_id)
+                for user_id, author_id in subscriptions
+                for recipe_id in recipe_ids[author_id]
+            ],
+            ignore_conflicts=True,
+        )
+
+    def follow(self, user, author):
+        # The counter has just been incremented with F() in the database.
+        author.refresh_from_db(fields=('subscribers_count',))
+        if author.subscribers_count >= settings.FEED_FANOUT_THRESHOLD:
+            return
+        self.bulk_create(
+            [
+                self.model(user=user, recipe_id=recipe_id)
+                for recipe_id in author.recipes.values_list('id', flat=True)
+            ],
+            ignore_conflicts=True,
+        )
+
+    def unfollow(self, user, author):
+        self.filter(user=user, recipe__author=author).delete()
+
+    def rebuild(self, users):
+        with transaction.atomic():
+            self.filter(user__in=users).delete()
+            self.bulk_create(
+                [
+                    self.model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id, recipe_id in Recipe.objects.filter(
+                        author__subscribers__user__in=users,
+                        author__subscribers_count__lt=(
+                            settings.FEED_FANOUT_THRESHOLD
+                        )
+                    ).values_list('author__subscribers__user', 'id')
+                ],
+                ignore_conflicts=True,
+            )
+
+    def filter_feed(self, recipes, user):
+        popular = list(
+            self.popular_authors().filter(
+                subscribers__user=user
+            ).values_list('id', flat=True)
+        )
+        if not popular:
+            return recipes.filter(feed_entries__user=user)
+        # Authors above the fan-out threshold have no timeline rows, so
+        # their recipes are merged in when the feed is read.
+        return recipes.filter(
+            Q(id__in=self.filter(user=user).values('recipe'))
+            | Q(author__in=popular)
+        )
+
+
+class FeedEntry(models.Model):
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feedentry'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe.name}'
+
+
+class RecipeNeighbour(models.Model):
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbours',
+        verbose_name='Рецепт',
+    )
+    neighbour = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbour_of',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            UniqueConstraint(
+                fields=('recipe', 'neighbour'),
+                name='unique_recipeneighbour'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.neighbour.name}'
+
+
+class RecipeChangeCounter(models.Model):
+
+    value = models.PositiveBigIntegerField('Последний номер', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчик изменений рецептов'
+        verbose_name_plural = 'Счётчики изменений рецептов'
+
+
+class RecipeChangeManager(models.Manager):
+
+    def last_sequence(self):
+        sequence = RecipeChangeCounter.objects.filter(pk=1).values_list(
+            'value', flat=True
+        ).first()
+        return sequence or 0
+
+    def advance(self, step):
+        # The UPDATE locks the counter row until commit, so writers get
+        # distinct numbers and readers never see a later one before an
+        # earlier one.
+        counter = RecipeChangeCounter.objects.filter(pk=1)
+        if not counter.update(value=F('value') + step):
+            RecipeChangeCounter.objects.create(pk=1, value=step)
+        return counter.values_list('value', flat=True).get()
+
+    def log(self, recipe_ids):
+        with transaction.atomic():
+            sequence = self.advance(1)
+            self.bulk_create(
+                self.model(sequence=sequence, recipe_id=recipe_id)
+                for recipe_id in set(recipe_ids)
+            )
+            self.filter(sequence__lte=sequence - MAX_RECIPE_CHANGES).delete()
+        return sequence
+
+    def reset(self):
+        # Jumps past the kept entries, so every reader has to rebuild.
+        with transaction.atomic():
+            return self.advance(MAX_RECIPE_CHANGES)
+
+    def get_changes(self, since, until):
+        # None means the entries are already pruned and the caller has to
+        # start over.
+        if not 0 <= until - since < MAX_RECIPE_CHANGES:
+            return None
+        changes = set(
+            self.filter(
+                sequence__gt=since, sequence__lte=until
+            ).values_list('recipe_id', flat=True)
+        )
+        if self.last_sequence() - since >= MAX_RECIPE_CHANGES:
+            return None
+        return changes
+
+
+class RecipeChange(models.Model):
+
+    sequence = models.PositiveBigIntegerField('Номер', db_index=True)
+    # Not a foreign key: deleted recipes have to be logged too.
+    recipe_id = models.PositiveBigIntegerField('Рецепт')
+
+    objects = RecipeChangeManager()
+
+    class Meta:
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'Изменения рецептов'
+
+    def __str__(self):
+        return f'{self.sequence}: {self.recipe_id}'
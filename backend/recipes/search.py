@@ -0,0 +1,77 @@
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+
+
+def search_vector():
+    # 0006_recipe_search indexes exactly this expression on PostgreSQL.
+    return SearchVector('name', 'text', config=SEARCH_CONFIG)
+
+
+def fts_query(value):
+    return ' '.join(
+        '"{}"'.format(word.replace('"', '""')) for word in value.split()
+    )
+
+
+def index_recipes(recipes):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(recipe.id,) for recipe in recipes]
+        )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE}(rowid, name, text) VALUES (%s, %s, %s)',
+            [(recipe.id, recipe.name, recipe.text) for recipe in recipes]
+        )
+
+
+def unindex_recipes(recipe_ids):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(recipe_id,) for recipe_id in recipe_ids]
+        )
+
+
+def search_recipes(queryset, value):
+    if not value.strip():
+        return queryset
+
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.annotate(
+            search=search_vector(),
+            search_rank=SearchRank(search_vector(), query),
+        ).filter(search=query).order_by('-search_rank', 'id')
+
+    if connection.vendor == 'sqlite':
+        query = fts_query(value)
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (query,)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid = recipes_recipe.id',
+            (query,)
+        )).order_by('-search_rank', 'id')
+
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    )
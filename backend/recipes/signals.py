@@ -0,0 +1,119 @@
+from threading import local
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import User
+from .models import Ingredient, Recipe, RecipeChange, RecipeIngredient, Tag
+from .search import index_recipes, unindex_recipes
+from .versions import INGREDIENTS, RECIPES, TAGS, bump_version
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    transaction.on_commit(lambda: bump_version(INGREDIENTS))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(**kwargs):
+    transaction.on_commit(lambda: bump_version(TAGS))
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(instance, **kwargs):
+    index_recipes([instance])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(instance, **kwargs):
+    unindex_recipes([instance.id])
+
+
+# Recipes changed in the current thread's transaction. Ids left over from
+# a rolled back transaction are logged with the next one, which only costs
+# a needless refresh.
+_changed = local()
+
+
+def log_changed_recipes():
+    recipe_ids = getattr(_changed, 'recipe_ids', None)
+    _changed.recipe_ids = set()
+    if recipe_ids:
+        RecipeChange.objects.log(recipe_ids)
+
+
+def remember_changed_recipe(recipe_id):
+    if not hasattr(_changed, 'recipe_ids'):
+        _changed.recipe_ids = set()
+    _changed.recipe_ids.add(recipe_id)
+    # Every change registers the callback, so one survives savepoint
+    # rollbacks; the first to run logs the whole transaction at once and
+    # the rest find nothing left.
+    transaction.on_commit(log_changed_recipes)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def log_recipe_change(instance, **kwargs):
+    # Deletion clears the pk before the transaction commits.
+    remember_changed_recipe(instance.id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def log_recipe_ingredient_change(instance, **kwargs):
+    remember_changed_recipe(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_recipes_version(**kwargs):
+    transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+# Author fields that the recipe payload shows.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name', 'avatar')
+
+
+def get_author_payload(values):
+    # Files come back as names from the database and as files from models.
+    return tuple(str(value or '') for value in values)
+
+
+@receiver(pre_save, sender=User)
+def remember_author_payload(instance, update_fields=None, **kwargs):
+    if instance.pk is None or (
+        update_fields is not None
+        and not set(AUTHOR_FIELDS).intersection(update_fields)
+    ):
+        return
+    saved = User.objects.filter(pk=instance.pk).values_list(
+        *AUTHOR_FIELDS
+    ).first()
+    if saved is not None:
+        instance._author_payload = get_author_payload(saved)
+
+
+@receiver(post_save, sender=User)
+def bump_recipes_version_for_author(instance, **kwargs):
+    # Registration, logins and password changes leave recipes as they are.
+    saved = instance.__dict__.pop('_author_payload', None)
+    if saved is None or saved == get_author_payload(
+        getattr(instance, field) for field in AUTHOR_FIELDS
+    ):
+        return
+    transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+@receiver(post_delete, sender=User)
+def bump_recipes_version_for_deleted_author(**kwargs):
+    transaction.on_commit(lambda: bump_version(RECIPES))
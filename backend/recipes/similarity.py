@@ -0,0 +1,195 @@
+import multiprocessing
+from array import array
+
+import numpy as np
+from django.db import connections, transaction
+from scipy import sparse
+
+from .models import Recipe, RecipeIngredient, RecipeNeighbour
+
+
+TOP_K = 10
+BLOCK_SIZE = 1000
+# Bounds the recipe pairs one block compares. Each pair takes about 24
+# bytes (its index and count in the product, its row and its score), so
+# this is roughly 250 MB per worker.
+MAX_BLOCK_PAIRS = 10_000_000
+
+# Filled before the worker pool forks. The matrices live in NumPy buffers
+# that reference counting never writes to, so workers share them
+# copy-on-write instead of copying them.
+_matrix = None
+
+
+class IngredientMatrix:
+
+    def __init__(self):
+        recipes, ingredients = array('q'), array('q')
+        rows = RecipeIngredient.objects.values_list(
+            'recipe', 'ingredient'
+        ).order_by()
+        for recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+            recipes.append(recipe_id)
+            ingredients.append(ingredient_id)
+        self.recipe_ids, rows = np.unique(
+            np.frombuffer(recipes, dtype=np.int64), return_inverse=True
+        )
+        _, columns = np.unique(
+            np.frombuffer(ingredients, dtype=np.int64), return_inverse=True
+        )
+        # A binary recipe x ingredient matrix takes 8 bytes per recipe
+        # ingredient, twice with the transposed copy.
+        self.matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, columns)),
+            shape=(len(self.recipe_ids), columns.max(initial=-1) + 1),
+        )
+        self.transposed = self.matrix.T.tocsr()
+        self.sizes = np.diff(self.matrix.indptr)
+        # How many pairs each recipe's row of the product can have at most.
+        self.pairs = self.matrix @ np.diff(self.transposed.indptr)
+
+    def rows(self, recipe_ids):
+        # Recipes without ingredients have no row and no neighbours.
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        rows = np.searchsorted(self.recipe_ids, recipe_ids)
+        found = rows < len(self.recipe_ids)
+        found[found] = self.recipe_ids[rows[found]] == recipe_ids[found]
+        return rows, found
+
+    def blocks(self, recipe_ids, block_size, max_pairs):
+        rows, found = self.rows(recipe_ids)
+        pairs = np.zeros(len(recipe_ids), dtype=np.int64)
+        pairs[found] = self.pairs[rows[found]]
+        start = 0
+        while start < len(recipe_ids):
+            end = min(start + block_size, len(recipe_ids))
+            fits = np.searchsorted(
+                np.cumsum(pairs[start:end]), max_pairs, side='right'
+            )
+            end = start + max(1, min(fits, end - start))
+            yield recipe_ids[start:end]
+            start = end
+
+    def neighbours(self, recipe_ids, top_k):
+        rows, found = self.rows(recipe_ids)
+        rows = rows[found]
+        # Every recipe that shares at least one ingredient, however common,
+        # is scored, so the top K are exact.
+        overlap = (self.matrix[rows] @ self.transposed).tocsr()
+        block_rows = np.repeat(rows, np.diff(overlap.indptr))
+        scores = overlap.data / (
+            self.sizes[block_rows] + self.sizes[overlap.indices]
+            - overlap.data
+        )
+        neighbours = []
+        for position, row in enumerate(rows):
+            start, end = overlap.indptr[position:position + 2]
+            others = overlap.indices[start:end]
+            row_scores = scores[start:end]
+            keep = others != row
+            others, row_scores = others[keep], row_scores[keep]
+            if len(others) > top_k:
+                least = np.partition(row_scores, -top_k)[-top_k]
+                keep = row_scores >= least
+                others, row_scores = others[keep], row_scores[keep]
+            # Best score first, ties go to the newer recipe.
+            order = np.lexsort((-others, -row_scores))[:top_k]
+            recipe_id = int(self.recipe_ids[row])
+            neighbours.extend(zip(
+                [recipe_id] * len(order),
+                self.recipe_ids[others[order]].tolist(),
+                row_scores[order].tolist(),
+            ))
+        return neighbours
+
+
+def compute_block(args):
+    recipe_ids, top_k = args
+    return recipe_ids, _matrix.neighbours(recipe_ids, top_k)
+
+
+def compute(matrix, recipe_ids, top_k, block_size, max_pairs, workers):
+    global _matrix
+    _matrix = matrix
+    blocks = (
+        (block, top_k)
+        for block in matrix.blocks(recipe_ids, block_size, max_pairs)
+    )
+    if workers <= 1:
+        yield from map(compute_block, blocks)
+        return
+    # Forked workers must not reuse the parent's database sockets.
+    connections.close_all()
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        yield from pool.imap(compute_block, blocks)
+
+
+def save_block(recipe_ids, rows):
+    with transaction.atomic():
+        RecipeNeighbour.objects.filter(recipe__in=recipe_ids).delete()
+        RecipeNeighbour.objects.bulk_create(
+            RecipeNeighbour(
+                recipe_id=recipe_id, neighbour_id=neighbour_id, score=score
+            )
+            for recipe_id, neighbour_id, score in rows
+        )
+
+
+def mark_stale(recipe_ids, stale, block_size=BLOCK_SIZE):
+    for start in range(0, len(recipe_ids), block_size):
+        Recipe.objects.filter(
+            id__in=recipe_ids[start:start + block_size]
+        ).update(neighbours_stale=stale)
+
+
+def rebuild_neighbours(
+    incremental=False,
+    top_k=TOP_K,
+    block_size=BLOCK_SIZE,
+    workers=1,
+    max_pairs=MAX_BLOCK_PAIRS,
+    progress=None,
+):
+    recipes = Recipe.objects.order_by('id')
+    if incremental:
+        recipes = recipes.filter(neighbours_stale=True)
+    recipe_ids = list(recipes.values_list('id', flat=True))
+    if not recipe_ids:
+        return 0
+    # Clear the flags first: recipes edited while the job runs are
+    # flagged again and picked up next time.
+    mark_stale(recipe_ids, False, block_size)
+    try:
+        matrix = IngredientMatrix()
+        if incremental:
+            affected = set(RecipeNeighbour.objects.filter(
+                neighbour__in=recipe_ids
+            ).values_list('recipe', flat=True))
+        total = len(recipe_ids)
+        done = 0
+        for block, rows in compute(
+            matrix, recipe_ids, top_k, block_size, max_pairs, workers
+        ):
+            save_block(block, rows)
+            if incremental:
+                affected.update(neighbour_id for _, neighbour_id, _ in rows)
+            done += len(block)
+            if progress:
+                progress(done, total)
+
+        if incremental:
+            # Recipes that listed, or now resemble, a changed recipe get
+            # their lists recomputed too; a full rebuild catches the rest.
+            affected = sorted(affected.difference(recipe_ids))
+            total += len(affected)
+            for block, rows in compute(
+                matrix, affected, top_k, block_size, max_pairs, workers
+            ):
+                save_block(block, rows)
+                done += len(block)
+                if progress:
+                    progress(done, total)
+    except BaseException:
+        mark_stale(recipe_ids, True, block_size)
+        raise
+    return done
@@ -0,0 +1,82 @@
+from django.test import TestCase
+
+from users.models import User
+from .models import Ingredient, Recipe, RecipeIngredient, RecipeNeighbour
+from .similarity import IngredientMatrix, rebuild_neighbours
+
+
+class SimilarRecipesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='password',
+        )
+        salt, flour, sugar, milk = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Соль', 'Мука', 'Сахар', 'Молоко')
+        )
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10,
+                image='recipes/test.jpg',
+            )
+            for number in range(4)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe, ingredients in zip(cls.recipes, (
+                (salt, flour, sugar),
+                (salt, flour, sugar),
+                (salt,),
+                (salt, milk),
+            ))
+            for ingredient in ingredients
+        )
+
+    def get_scores(self, recipe):
+        return dict(
+            RecipeNeighbour.objects.filter(recipe=recipe).values_list(
+                'neighbour', 'score'
+            )
+        )
+
+    # Salt is in every recipe; pairs that share only salt are scored too.
+    def test_common_ingredients_count_towards_overlap(self):
+        rebuild_neighbours()
+        first, second, plain, milky = self.recipes
+        self.assertEqual(self.get_scores(first), {
+            second.id: 1.0, plain.id: 1 / 3, milky.id: 1 / 4
+        })
+        self.assertEqual(self.get_scores(plain), {
+            first.id: 1 / 3, second.id: 1 / 3, milky.id: 1 / 2
+        })
+
+    def test_blocks_stay_under_the_pair_limit(self):
+        matrix = IngredientMatrix()
+        recipe_ids = [recipe.id for recipe in self.recipes]
+        blocks = list(matrix.blocks(recipe_ids, 1000, max_pairs=8))
+        self.assertEqual(sum(blocks, []), recipe_ids)
+        self.assertGreater(len(blocks), 1)
+        for block in blocks:
+            rows, _ = matrix.rows(block)
+            self.assertTrue(
+                len(block) == 1 or matrix.pairs[rows].sum() <= 8
+            )
+
+    def test_block_split_does_not_change_scores(self):
+        rebuild_neighbours()
+        expected = set(RecipeNeighbour.objects.values_list(
+            'recipe', 'neighbour', 'score'
+        ))
+        rebuild_neighbours(block_size=3, max_pairs=1)
+        self.assertEqual(set(RecipeNeighbour.objects.values_list(
+            'recipe', 'neighbour', 'score'
+        )), expected)
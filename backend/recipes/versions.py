@@ -0,0 +1,40 @@
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+INGREDIENTS = 'ingredients'
+RECIPES = 'recipes'
+TAGS = 'tags'
+
+LOCAL_CACHE_TIMEOUT = 60
+
+
+def _key(namespace):
+    return f'version:{namespace}'
+
+
+def get_timeout(timeout):
+    # A local memory cache lives in one process and never sees bumps made
+    # by other workers, so whatever it holds has to expire soon.
+    if isinstance(caches['default'], LocMemCache):
+        return min(timeout or LOCAL_CACHE_TIMEOUT, LOCAL_CACHE_TIMEOUT)
+    return timeout
+
+
+def get_version(namespace):
+    # Start from a timestamp so a version lost on cache eviction never
+    # collides with one that workers may still hold.
+    return cache.get_or_set(
+        _key(namespace), time.time_ns(), timeout=get_timeout(None)
+    )
+
+
+def bump_version(namespace):
+    try:
+        return cache.incr(_key(namespace))
+    except ValueError:
+        version = time.time_ns()
+        cache.set(_key(namespace), version, timeout=get_timeout(None))
+        return version
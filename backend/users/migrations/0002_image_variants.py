@@ -0,0 +1,19 @@
+# Generated by Django 4.2.14 on 2026-10-17 04:30
+
+from django.db import migrations
+import recipes.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=recipes.images.VariantImageField(blank=True, null=True, upload_to='avatars/'),
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.contrib.auth.models import AbstractUser
 from django.db.models.constraints import UniqueConstraint
 from django.db import models
 
+from recipes.images import VariantImageField
+
 
 class User(AbstractUser):
 
@@ -18,11 +20,21 @@ class User(AbstractUser):
         'Фамилия',
         max_length=150
     )
-    avatar = models.ImageField(
+    avatar = VariantImageField(
         upload_to='avatars/',
         null=True,
         blank=True
     )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        editable=False,
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -55,6 +67,12 @@ class Subscription(models.Model):
                 name='unique_subscription'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('author', 'user'),
+                name='subscription_author_user_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.user}'